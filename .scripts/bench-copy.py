@@ -0,0 +1,84 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks the throughput of the copy backends of the CopyEngine with a
+few large files and compares them with shutil.copyfile().
+
+    python .scripts/bench-copy.py [file_size_mb] [num_files] [workers]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'c4dinstaller'))
+import copyengine
+
+MB = 1024 * 1024
+
+
+def run_engine(files, dest, backend, workers):
+  engine = copyengine.CopyEngine(workers, backend=backend)
+  engine.start()
+  for filename in files:
+    engine.put(filename, os.path.join(dest, os.path.basename(filename)))
+  engine.join()
+
+
+def run_shutil(files, dest, backend, workers):
+  for filename in files:
+    shutil.copyfile(filename, os.path.join(dest, os.path.basename(filename)))
+
+
+def bench(name, func, files, root, backend=None, workers=1, repeat=3):
+  total = sum(os.path.getsize(x) for x in files)
+  best = None
+  for i in range(repeat):
+    dest = os.path.join(root, 'dest')
+    os.makedirs(dest)
+    start = time.perf_counter()
+    func(files, dest, backend, workers)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(dest)
+    best = elapsed if best is None else min(best, elapsed)
+  print('{:<16} {:8.3f}s {:10.1f} MB/s'.format(name, best, total / MB / best))
+
+
+def main():
+  size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+  count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+  workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+  root = tempfile.mkdtemp()
+  try:
+    print('Creating {} files of {} MB in {} ...'.format(count, size, root))
+    files = []
+    chunk = os.urandom(MB)
+    for i in range(count):
+      files.append(os.path.join(root, 'file{}.bin'.format(i)))
+      with open(files[-1], 'wb') as fp:
+        for j in range(size):
+          fp.write(chunk)
+    bench('shutil.copyfile', run_shutil, files, root)
+    for backend in copyengine.COPY_BACKENDS:
+      bench(backend, run_engine, files, root, backend, workers)
+  finally:
+    shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,84 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks collecting the file list with the scandir based walker against
+the former recursive os.listdir() implementation on a synthetic tree.
+
+    python .scripts/bench-filelist.py [num_files]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'c4dinstaller'))
+import copyengine
+
+
+def get_filelist_listdir(from_, to):
+  # The former implementation, plus the stat() pass needed for the sizes.
+  if os.path.isfile(from_):
+    yield (from_, to, os.path.getsize(from_))
+  elif os.path.isdir(from_):
+    for filename in os.listdir(from_):
+      yield from get_filelist_listdir(os.path.join(from_, filename), os.path.join(to, filename))
+  else:
+    raise FileNotFoundError(from_)
+
+
+def make_tree(root, num_files, files_per_dir=100, dirs_per_dir=10):
+  dirs = [root]
+  created = 0
+  while created < num_files:
+    parent = dirs.pop(0)
+    for i in range(dirs_per_dir):
+      dirs.append(os.path.join(parent, 'd{}'.format(i)))
+      os.makedirs(dirs[-1])
+    for i in range(min(files_per_dir, num_files - created)):
+      with open(os.path.join(parent, 'f{}'.format(i)), 'w') as fp:
+        fp.write('x' * (i % 64))
+      created += 1
+
+
+def bench(name, func, root, repeat=3):
+  best = None
+  for i in range(repeat):
+    start = time.perf_counter()
+    count = sum(1 for x in func(root, '/target'))
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  print('{:<10} {:>8} files  {:8.3f}s'.format(name, count, best))
+  return best
+
+
+def main():
+  num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  root = tempfile.mkdtemp()
+  try:
+    print('Creating {} files in {} ...'.format(num_files, root))
+    make_tree(os.path.join(root, 'src'), num_files)
+    src = os.path.join(root, 'src')
+    old = bench('listdir', get_filelist_listdir, src)
+    new = bench('scandir', copyengine.iter_files, src)
+    print('Speedup: {:.2f}x'.format(old / new))
+  finally:
+    shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,85 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks the search for Cinema 4D installations in a synthetic tree of
+applications, with and without the installation cache, and compares it
+with a full walk of the tree. Does not require PyQt5.
+
+    python .scripts/bench-finder.py [num_apps] [depth]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from c4dinstaller.utils import c4dfinder
+
+
+def make_tree(root, count):
+  # Vendor directories with application bundles that are full of files,
+  # and a Cinema 4D installation in every tenth vendor directory.
+  for i in range(count):
+    vendor = os.path.join(root, 'vendor{}'.format(i % 50), 'product{}'.format(i))
+    bundle = os.path.join(vendor, 'App{}.app'.format(i), 'Contents', 'Resources')
+    os.makedirs(bundle)
+    for j in range(20):
+      open(os.path.join(bundle, 'resource{}'.format(j)), 'w').close()
+    if i % 10 == 0:
+      app = os.path.join(vendor, 'Cinema 4D R{}'.format(10 + i % 90), 'CINEMA 4D.app')
+      os.makedirs(app)
+
+
+def walk(root):
+  # Lists every directory of the tree, without pruning.
+  count = 0
+  for dirpath, dirnames, filenames in os.walk(root):
+    count += 1
+  return count
+
+
+def main():
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  depth = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+  root = tempfile.mkdtemp()
+  try:
+    tree = os.path.join(root, 'tree')
+    print('Creating {} applications in {} ...'.format(count, tree))
+    make_tree(tree, count)
+    cacheFile = os.path.join(root, 'installations.json')
+
+    start = time.perf_counter()
+    walk(tree)
+    print('{:<16} {:8.3f}s'.format('os.walk', time.perf_counter() - start))
+
+    start = time.perf_counter()
+    found = c4dfinder.scan_root(tree, depth)
+    print('{:<16} {:8.3f}s   {} installations'.format('scan', time.perf_counter() - start, len(found)))
+
+    for name in ('scan (cold)', 'scan (cached)'):
+      cache = c4dfinder.FinderCache(cacheFile)
+      start = time.perf_counter()
+      found = c4dfinder.scan_root(tree, depth, cache)
+      cache.save()
+      print('{:<16} {:8.3f}s   {} installations'.format(name, time.perf_counter() - start, len(found)))
+  finally:
+    shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,80 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks a complete installation and uninstallation of a synthetic tree
+with the InstallEngine in the pipeline and the collect-first mode. Does
+not require PyQt5.
+
+    python .scripts/bench-install.py [num_files] [workers]
+"""
+
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from c4dinstaller.installengine import InstallEngine, UninstallEngine
+
+
+def make_tree(root, count):
+  for i in range(count):
+    dirname = os.path.join(root, 'dir{}'.format(i % 32), 'sub{}'.format(i % 7))
+    os.makedirs(dirname, exist_ok=True)
+    with open(os.path.join(dirname, 'file{}.txt'.format(i)), 'wb') as fp:
+      fp.write(os.urandom(512 + i % 4096))
+
+
+def bench(src, root, workers, pipeline):
+  dest = os.path.join(root, 'dest')
+  dataFile = os.path.join(dest, 'uninstall.data')
+  engine = InstallEngine([(src, dest)], [], dataFile, workers=workers, pipeline=pipeline)
+  start = time.perf_counter()
+  engine.start()
+  engine.wait()
+  installed = time.perf_counter() - start
+  if engine.mode() != InstallEngine.Mode.Complete:
+    raise RuntimeError('installation failed: {}'.format(engine.mode()))
+  engine = UninstallEngine(dataFile, workers)
+  start = time.perf_counter()
+  engine.start()
+  engine.wait()
+  uninstalled = time.perf_counter() - start
+  shutil.rmtree(dest, ignore_errors=True)
+  return installed, uninstalled
+
+
+def main():
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+  root = tempfile.mkdtemp()
+  try:
+    src = os.path.join(root, 'src')
+    print('Creating {} files in {} ...'.format(count, src))
+    make_tree(src, count)
+    for name, pipeline in [('collect', False), ('pipeline', True)]:
+      # The engine prints every file it installs.
+      with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        result = bench(src, root, workers, pipeline)
+      print('{:<16} install {:8.3f}s   uninstall {:8.3f}s'.format(name, *result))
+  finally:
+    shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+  main()
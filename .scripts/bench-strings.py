@@ -0,0 +1,79 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks looking up the strings of data/strings/en.json, once by
+expanding the variables of the string on every lookup like earlier
+versions of the installer did, and once with the string catalog. Does
+not require PyQt5.
+
+    python .scripts/bench-strings.py [num_lookups]
+"""
+
+import json
+import os
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+from c4dinstaller import read_strings
+
+
+def localize_template(strings, name=None, subst=None):
+  # The implementation of localize() before the string catalog.
+  if name is not None:
+    try:
+      value = strings[name]
+    except KeyError:
+      if subst is None:
+        raise
+      value = subst
+  else:
+    value = subst
+  return string.Template(value).safe_substitute(**strings.get('__vars__'))
+
+
+def bench(func, strings, lookups):
+  start = time.perf_counter()
+  for name, subst in lookups:
+    func(strings, name, subst)
+  return time.perf_counter() - start
+
+
+def main():
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  with open('data/strings/en.json') as fp:
+    raw = json.load(fp)
+
+  start = time.perf_counter()
+  catalog = read_strings('en')
+  print('{:<10} {:8.3f}ms'.format('load', (time.perf_counter() - start) * 1000))
+
+  names = [name for name in raw if name != '__vars__']
+  cases = [
+    ('names', [(names[i % len(names)], None) for i in range(count)]),
+    ('subst', [(None, '$plugin Feature {}'.format(i % 10)) for i in range(count)]),
+  ]
+  print('{:<10} {:>12} {:>12}'.format('lookups', 'template', 'catalog'))
+  for label, lookups in cases:
+    template = bench(localize_template, raw, lookups)
+    compiled = bench(lambda c, n, s: c.localize(n, s), catalog, lookups)
+    print('{:<10} {:>11.3f}s {:>11.3f}s'.format(label, template, compiled))
+
+
+if __name__ == '__main__':
+  main()
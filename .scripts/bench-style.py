@@ -0,0 +1,96 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks styling a window with a growing number of widgets, once with
+the style sheet of the window and once by setting a style sheet on every
+button and line edit while recursing over findChildren(), like earlier
+versions of the installer did. Requires PyQt5, set QT_QPA_PLATFORM to
+``offscreen`` to run it without a display.
+
+    python .scripts/bench-style.py [max_widgets]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+from c4dinstaller import read_config
+from c4dinstaller.base import make_palette, make_stylesheet
+from PyQt5.QtWidgets import *
+
+
+def make_window(count):
+  # Nested group boxes, each with a few buttons and a line edit.
+  window = QWidget()
+  parent = window
+  for i in range(count // 4):
+    box = QGroupBox(parent)
+    layout = QVBoxLayout(box)
+    for j in range(3):
+      layout.addWidget(QPushButton('Button {}'.format(j), box))
+    layout.addWidget(QLineEdit(box))
+    parent = box if i % 8 else window
+  return window
+
+
+def style_recursive(window, config):
+  style = make_stylesheet(config)
+  palette = make_palette(config, window.palette())
+  def applyStyle(widget):
+    if isinstance(widget, (QPushButton, QToolButton)):
+      widget.setStyleSheet(style)
+    elif isinstance(widget, QLineEdit):
+      widget.setStyleSheet(style)
+      widget.setAutoFillBackground(True)
+      widget.setPalette(palette)
+    for child in widget.findChildren(QWidget):
+      applyStyle(child)
+  window.setPalette(palette)
+  applyStyle(window)
+
+
+def style_window(window, config):
+  window.setPalette(make_palette(config, window.palette()))
+  window.setStyleSheet(make_stylesheet(config))
+
+
+def bench(func, count, config):
+  window = make_window(count)
+  start = time.perf_counter()
+  func(window, config)
+  # Style sheets are applied when the widgets are polished.
+  for widget in window.findChildren(QWidget):
+    widget.ensurePolished()
+  return time.perf_counter() - start
+
+
+def main():
+  maxCount = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+  app = QApplication(sys.argv)
+  config = read_config()
+  print('{:>8} {:>12} {:>12}'.format('widgets', 'recursive', 'style sheet'))
+  count = 50
+  while count <= maxCount:
+    recursive = bench(style_recursive, count, config)
+    window = bench(style_window, count, config)
+    print('{:>8} {:>11.3f}s {:>11.3f}s'.format(count, recursive, window))
+    count *= 2
+
+
+if __name__ == '__main__':
+  main()
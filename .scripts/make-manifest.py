@@ -0,0 +1,30 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+This script is run before the installer is built to write the manifest
+of the data/install directory to data/manifest.json.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from c4dinstaller.manifest import Manifest
+
+manifest = Manifest.build('data/install')
+manifest.save('data/manifest.json')
+print("Wrote manifest of {} files ({}) to data/manifest.json".format(
+    len(manifest), manifest.algorithm))
@@ -0,0 +1,46 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+This script is run before the installer is built. If "install.payload" is
+set to "zip" in data/config.json, it packs the data/install directory into
+data/install.zip, which is then bundled instead of the loose files.
+Otherwise, it removes an archive from a previous build.
+"""
+
+import json
+import os
+import zipfile
+
+with open('data/config.json') as fp:
+  config = json.load(fp)
+
+source = 'data/install'
+dest = 'data/install.zip'
+payload = config['install'].get('payload', False)
+
+if payload == 'zip':
+  print("Packing {} into {} ...".format(source, dest))
+  with zipfile.ZipFile(dest, 'w', zipfile.ZIP_DEFLATED) as zf:
+    for root, dirs, files in os.walk(source):
+      dirs.sort()
+      for filename in sorted(files):
+        path = os.path.join(root, filename)
+        zf.write(path, os.path.relpath(path, source).replace(os.sep, '/'))
+elif payload:
+  raise ValueError('unsupported payload format: {!r}'.format(payload))
+elif os.path.isfile(dest):
+  print("Removing {} ...".format(dest))
+  os.remove(dest)
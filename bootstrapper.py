@@ -21,12 +21,17 @@ import subprocess
 import sys
 import traceback
 
-try:
-  from PyQt5.QtWidgets import QApplication, QMessageBox
-except ImportError:
-  QApplication = QMessageBox = None
+headless = '--headless' in sys.argv[1:]
 
 def fatal(message):
+  # Qt is imported only when needed, the headless installer does not
+  # use it and must work without a display.
+  QApplication = QMessageBox = None
+  if not headless:
+    try:
+      from PyQt5.QtWidgets import QApplication, QMessageBox
+    except ImportError:
+      pass
   if QMessageBox:
     try:
       app = QApplication(sys.argv)
@@ -77,9 +82,13 @@ def elevate(command):
 
 def main():
   try:
-    if not is_admin():
+    if headless:
+      # There is nobody to ask for the password, the installer must
+      # already be run with the required privileges.
+      pass
+    elif not is_admin():
       try:
-        elevate([sys.executable, os.path.abspath(sys.argv[0])])
+        elevate([sys.executable, os.path.abspath(sys.argv[0])] + sys.argv[1:])
       except NotImplementedError as exc:
         if sys.frozen:
           raise
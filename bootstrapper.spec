@@ -37,6 +37,8 @@ def recursive_data_files(path, target_dir, exclude=()):
     if match_patterns(arcdir, exclude):
       continue
     for filename in files:
+      if match_patterns(os.path.join(arcdir, filename), exclude):
+        continue
       result.append((os.path.join(root, filename), arcdir))
   return result
 
@@ -57,8 +59,15 @@ print('-'*80)
 installer_icon = "data/image/icon.ico" if not is_mac else "data/image/icon.icns"
 block_cipher = None
 
-datas = recursive_data_files('data', 'data',
-  exclude = [] if is_installer else ['data/install*', 'data/uninstaller*'])
+if not is_installer:
+  exclude = ['data/install*', 'data/manifest.json', 'data/uninstaller*']
+elif os.path.isfile('data/install.zip'):
+  # The files are extracted from the payload archive, no need to bundle them.
+  exclude = ['data/install', os.path.join('data/install', '*')]
+else:
+  exclude = []
+
+datas = recursive_data_files('data', 'data', exclude=exclude)
 
 a = Analysis(['bootstrapper.py'],
   pathex = [os.getcwd()],
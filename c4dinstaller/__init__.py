@@ -14,19 +14,29 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from PyQt5.QtWidgets import QApplication
+import time
+
+# The start of the installer, before anything else of the package is
+# imported. See utils.StartupTimer.
+STARTED = time.monotonic()
 
 import collections
 import json
 import sys
 import os
 
+from .catalog import StringCatalog
+
 if sys.platform.startswith('win'):
   PLATFORM = 'windows'
   APP_SUFFIX = '.exe'
-elif sys.platform.startswith('mac'):
+elif sys.platform.startswith('darwin'):
   PLATFORM = 'osx'
   APP_SUFFIX = '.app'
+elif sys.platform.startswith('linux'):
+  # Only supported by the headless installer.
+  PLATFORM = 'linux'
+  APP_SUFFIX = ''
 else:
   raise EnvironmentError('unsupported platform: {}'.format(sys.platform))
 
@@ -39,16 +49,75 @@ def read_config():
 
 
 def read_strings(lang_code='en'):
+  """
+  Reads the string resource of the language *lang_code* and returns it
+  as a :class:`StringCatalog`.
+  """
+
   with open('data/strings/{}.json'.format(lang_code)) as fp:
-    return json.load(fp)
+    return StringCatalog(json.load(fp), lang_code)
+
+
+def get_config(config, name, default=NotImplemented):
+  """
+  Returns the value of the dotted *name* in *config*. If it does not
+  exist, *default* is returned if it is specified.
+  """
+
+  try:
+    value = config
+    for part in name.split('.'):
+      value = value[part]
+  except KeyError:
+    if default is NotImplemented:
+      raise
+    value = default
+  return value
+
+
+def localize(strings, name=None, subst=None):
+  """
+  If *name* is specified, it must be a key of a string from the string
+  resource.
+
+  Otherwise, *subst* must be specified which can be just a string value
+  that will be returned. Also, if *subst* is specified and the key for
+  *name* does not exist, *subst* will be used instead.
+
+  Variables in the returned value will be expanded. *strings* should be
+  a :class:`StringCatalog` as returned by :func:`read_strings`, a plain
+  string resource dictionary is compiled on every call.
+  """
+
+  if not isinstance(strings, StringCatalog):
+    strings = StringCatalog(strings)
+  return strings.localize(name, subst)
 
 
 def main():
+  if '--headless' in sys.argv[1:]:
+    from .headless import main
+    return main([x for x in sys.argv[1:] if x != '--headless'])
+  from .utils import startup
+  from PyQt5.QtCore import QTimer
+  from PyQt5.QtWidgets import QApplication
+  startup.mark('imports')
   app = QApplication(sys.argv)
+  startup.mark('application')
   if os.getenv('UNINSTALLER', '') == 'true':
     from .uninstaller import Uninstaller as wnd_class
   else:
     from .installer import Installer as wnd_class
-  wnd = wnd_class(read_config(), read_strings())
+  config, strings = read_config(), read_strings()
+  startup.mark('resources')
+  wnd = wnd_class(config, strings)
+  startup.mark('window')
   wnd.show()
+  startup.mark('show')
+
+  def firstPaint():
+    # The first timer event is processed after the window was painted.
+    startup.mark('first paint')
+    startup.report()
+  QTimer.singleShot(0, firstPaint)
   return app.exec_()
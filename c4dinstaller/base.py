@@ -14,12 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from . import ui
+from . import ui, get_config, localize, read_strings
+from .utils import startup
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 
-import string
+import collections
 
 
 class PageBase(object):
@@ -29,12 +30,15 @@ class PageBase(object):
   def __init__(self, installer):
     self.installer = installer
 
-  def config(self, name):
-    return self.installer.config(name)
+  def config(self, name, default=NotImplemented):
+    return self.installer.config(name, default)
 
   def ls(self, name=None, subst=None):
     return self.installer.ls(name, subst)
 
+  def setLocalizedText(self, setter, name=None, subst=None):
+    self.installer.setLocalizedText(setter, name, subst)
+
   def initButtonBox(self, nextPage=None):
     self.buttonOk = self.buttonBox.button(QDialogButtonBox.Ok)
     self.buttonCancel = self.buttonBox.button(QDialogButtonBox.Cancel)
@@ -42,14 +46,14 @@ class PageBase(object):
     self.nextPageName = nextPage
 
     if self.buttonOk:
-      self.buttonOk.setText(self.ls('button.next'))
+      self.setLocalizedText(self.buttonOk.setText, 'button.next')
     if self.buttonOk and nextPage:
       self.buttonOk.clicked.connect(self.nextPage)
     if self.buttonCancel:
-      self.buttonCancel.setText(self.ls('button.cancel'))
+      self.setLocalizedText(self.buttonCancel.setText, 'button.cancel')
       self.buttonCancel.clicked.connect(lambda: self.installer.cancel())
     if self.buttonClose:
-      self.buttonClose.setText(self.ls('button.close'))
+      self.setLocalizedText(self.buttonClose.setText, 'button.close')
       self.buttonClose.clicked.connect(lambda: self.installer.close())
 
   def nextPage(self):
@@ -68,102 +72,175 @@ def FormPage(form_name):
   return Page
 
 
+def _rgb(color):
+  return "rgb(" + ",".join(map(str, color)) + ")"
+
+
+def make_palette(config, palette):
+  """
+  Returns a copy of *palette* with the colors of the ``"palette"`` section
+  of *config*.
+  """
+
+  palette = QPalette(palette)
+  color = get_config(config, 'palette.background')
+  palette.setColor(QPalette.Window, QColor(*color))
+  palette.setColor(QPalette.AlternateBase, QColor(*color))
+
+  color = get_config(config, 'palette.alternate_background')
+  palette.setColor(QPalette.Base, QColor(*color))
+
+  color = get_config(config, 'palette.foreground')
+  palette.setColor(QPalette.Text, QColor(*color))
+  palette.setColor(QPalette.ButtonText, QColor(*color))
+  palette.setColor(QPalette.WindowText, QColor(*color))
+  return palette
+
+
+def make_stylesheet(config):
+  """
+  Returns the style sheet for the buttons and line edits of the installer
+  window with the colors of the ``"palette"`` section of *config*.
+  """
+
+  bg = _rgb(get_config(config, 'palette.button_background'))
+  fg = _rgb(get_config(config, 'palette.button_foreground'))
+  style = "QPushButton { background:%s; color: %s}\n" % (bg, fg)
+  style += "QLineEdit{border: 1px solid gray; background-color: %s;}\n"\
+      "QLineEdit:hover{border: 1px solid gray; background-color: %s;}\n" % (bg, bg)
+
+  bg = _rgb(get_config(config, 'palette.button_disabled_background'))
+  fg = _rgb(get_config(config, 'palette.button_disabled_foreground'))
+  style += 'QPushButton:disabled { background: %s; color: %s }\n' % (bg, fg)
+  return style
+
+
 class BaseInstaller(ui.form('installer')):
+  """
+  The installer window. Subclasses register their pages with
+  :meth:`addPage` in :meth:`initForm`, a page is only constructed when
+  it is accessed first. The remaining pages are constructed while the
+  window is idle, :attr:`preloadDelay` milliseconds after it was created.
+
+  Texts that are set with :meth:`setLocalizedText` are updated when the
+  language is changed with :meth:`setLanguage`.
+  """
+
+  preloadDelay = 200
 
   def __init__(self, config, strings, parent=None):
     self._config = config
     self._strings = strings
+    self._texts = collections.OrderedDict()
+    self._pageClasses = collections.OrderedDict()
     self.currentPage = None
     super().__init__(parent)
 
+  def __getattr__(self, name):
+    # Only called if there is no attribute *name*, ie. for the pages that
+    # have not been constructed yet.
+    pageClasses = self.__dict__.get('_pageClasses')
+    if pageClasses and name in pageClasses:
+      return self.page(name)
+    raise AttributeError(name)
+
   def initForm(self):
     self.setWindowFlags(Qt.Window)
     self.bannerLayout.setSpacing(0)
+    # The banner images determine the size of the window, so they must be
+    # loaded before it is shown.
     self.bannerLeft.setPixmap(QPixmap("data/image/banner_01.png"))
     self.bannerMiddle.setPixmap(QPixmap("data/image/banner_02.png"))
     self.bannerRight.setPixmap(QPixmap("data/image/banner_03.png"))
     self.setWindowIcon(QIcon("data/image/icon.ico"))
+    startup.mark('banner')
     self.initStyle()
+    startup.mark('style')
+    QTimer.singleShot(self.preloadDelay, self.preloadPages)
+
+  def addPage(self, name, page_class):
+    """
+    Registers the *page_class* as the page attribute *name*. The page is
+    constructed when the attribute is accessed first.
+    """
+
+    self._pageClasses[name] = page_class
+
+  def page(self, name):
+    """
+    Returns the page *name*, constructing it if necessary.
+    """
+
+    page = self.__dict__.get(name)
+    if page is None:
+      page = self._pageClasses[name](self)
+      setattr(self, name, page)
+      self.stackedPages.addWidget(page)
+      if not startup.reported:
+        startup.mark(name)
+    return page
+
+  def pageLoaded(self, name):
+    """
+    Returns True if the page *name* has already been constructed.
+    """
+
+    return name in self.__dict__
+
+  def preloadPages(self):
+    """
+    Constructs the next page that has not been accessed yet, and schedules
+    the following one for the next iteration of the event loop. Widgets
+    can only be created in the main thread, this keeps the window
+    responsive while the pages are constructed.
+    """
+
+    for name in self._pageClasses:
+      if not self.pageLoaded(name):
+        self.page(name)
+        QTimer.singleShot(0, self.preloadPages)
+        return
 
   def initStyle(self):
-    def rgb(color): return "rgb(" + ",".join(map(str, color)) + ")"
-    buttonStyle = ""
-    lineEditStyle = ""
-    palette = self.palette()
-
-    color = self.config('palette.background')
-    palette.setColor(QPalette.Window, QColor(*color))
-    palette.setColor(QPalette.Base, QColor(*color))
-    palette.setColor(QPalette.AlternateBase, QColor(*color))
-
-    color = self.config('palette.alternate_background')
-    palette.setColor(QPalette.Base, QColor(*color))
-
-    color = self.config('palette.foreground')
-    palette.setColor(QPalette.Text, QColor(*color))
-    palette.setColor(QPalette.ButtonText, QColor(*color))
-    palette.setColor(QPalette.WindowText, QColor(*color))
-
-    bg = rgb(self.config('palette.button_background'))
-    fg = rgb(self.config('palette.button_foreground'))
-    buttonStyle += "QPushButton { background:%s; color: %s} " % (bg, fg)
-    lineEditStyle += "QLineEdit{border: 1px solid gray; background-color: %s;} "\
-        "QLineEdit:hover{border: 1px solid gray; background-color: %s;}" % (bg, bg)
-
-    bg = rgb(self.config('palette.button_disabled_background'))
-    fg = rgb(self.config('palette.button_disabled_foreground'))
-    buttonStyle += 'QPushButton:disabled { background: %s; color: %s }\n' % (bg, fg)
-
-    def applyStyle(widget):
-      if isinstance(widget, (QPushButton, QToolButton)):
-        widget.setStyleSheet(buttonStyle)
-      elif isinstance(widget, QLineEdit):
-        widget.setStyleSheet(lineEditStyle)
-        widget.setAutoFillBackground(True)
-        widget.setPalette(palette)
-      for child in widget.findChildren(QWidget):
-        applyStyle(child)
-
-    self.setPalette(palette)
-    applyStyle(self)
+    # The palette and the style sheet of the window are inherited by all
+    # of its widgets, including the pages that are constructed later.
+    self.setPalette(make_palette(self._config, self.palette()))
+    self.setStyleSheet(make_stylesheet(self._config))
 
   def ls(self, name=None, subst=None):
     """
-    If *name* is specified, it must be a key of a string from the string
-    resource.
+    See :func:`c4dinstaller.localize`.
+    """
 
-    Otherwise, *subst* must be specified which can be just a string value
-    that will be returned. Also, if *subst* is specified and the key for
-    *name* does not exist, *subst* will be used instead.
+    return localize(self._strings, name, subst)
 
-    Variables in the returned value will be expanded.
+  def setLocalizedText(self, setter, name=None, subst=None):
+    """
+    Calls *setter* with the localized string, like ``setter(self.ls(name,
+    subst))``, and again with the string of the new language every time
+    :meth:`setLanguage` is called. Setting another text with the same
+    *setter* replaces the previous one.
+    """
+
+    self._texts[setter] = (name, subst)
+    setter(self.ls(name, subst))
+
+  def setLanguage(self, lang_code):
+    """
+    Switches to the string resource of the language *lang_code* and
+    updates the texts of the window and of the constructed pages.
     """
 
-    if name is not None:
+    self._strings = read_strings(lang_code)
+    for setter, (name, subst) in list(self._texts.items()):
       try:
-        value = self._strings[name]
-      except KeyError as exc:
-        if subst is None:
-          raise
-        value = subst
-    elif subst is not None:
-      value = subst
-    else:
-      raise ValueError('At least one of "name" and "subst" must be specified')
-
-    template = string.Template(value)
-    return template.safe_substitute(**self._strings.get('__vars__'))
+        setter(self.ls(name, subst))
+      except RuntimeError:
+        # The widget of the setter has been deleted.
+        del self._texts[setter]
 
   def config(self, name, default=NotImplemented):
-    try:
-      value = self._config
-      for part in name.split('.'):
-        value = value[part]
-    except KeyError:
-      if default is NotImplemented:
-        raise
-      value = default
-    return value
+    return get_config(self._config, name, default)
 
   def setCurrentPage(self, page=None, save=True):
     if page is None:
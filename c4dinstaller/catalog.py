@@ -0,0 +1,102 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+The string resources of a language with their variables expanded once
+when they are loaded.
+"""
+
+import string
+
+
+def _references(template, names):
+  # Returns the names in *names* that are referenced in *template*.
+  result = set()
+  for match in template.pattern.finditer(template.template):
+    name = match.group('named') or match.group('braced')
+    if name in names:
+      result.add(name)
+  return result
+
+
+def resolve_variables(variables):
+  """
+  Expands the references to other variables in the values of the
+  *variables* dictionary and returns the expanded dictionary.
+
+  :raise ValueError: If variables reference each other in a cycle.
+  """
+
+  resolved = {}
+  def resolve(name, stack):
+    if name in resolved:
+      return resolved[name]
+    if name in stack:
+      raise ValueError('cyclic variable reference: ' + ' -> '.join(stack + [name]))
+    template = string.Template(variables[name])
+    refs = _references(template, variables)
+    mapping = {ref: resolve(ref, stack + [name]) for ref in refs}
+    resolved[name] = template.safe_substitute(mapping)
+    return resolved[name]
+
+  for name in variables:
+    resolve(name, [])
+  return resolved
+
+
+class StringCatalog(object):
+  """
+  The strings of a string resource like ``data/strings/en.json``. The
+  variables of the ``"__vars__"`` section may reference each other, they
+  are expanded in every string once when the catalog is created. Strings
+  that are not part of the resource are expanded by :meth:`localize` on
+  the first use and remembered.
+  """
+
+  def __init__(self, strings, lang_code=None):
+    self.lang_code = lang_code
+    self.vars = resolve_variables(strings.get('__vars__', {}))
+    self._strings = {}
+    for name, value in strings.items():
+      if name != '__vars__':
+        self._strings[name] = string.Template(value).safe_substitute(self.vars)
+    self._substituted = {}
+
+  def __contains__(self, name):
+    return name in self._strings
+
+  def __getitem__(self, name):
+    return self._strings[name]
+
+  def localize(self, name=None, subst=None):
+    """
+    See :func:`c4dinstaller.localize`.
+    """
+
+    if name is not None:
+      try:
+        return self._strings[name]
+      except KeyError:
+        if subst is None:
+          raise
+    elif subst is None:
+      raise ValueError('At least one of "name" and "subst" must be specified')
+
+    try:
+      return self._substituted[subst]
+    except KeyError:
+      value = string.Template(subst).safe_substitute(self.vars)
+      self._substituted[subst] = value
+      return value
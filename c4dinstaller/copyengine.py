@@ -0,0 +1,692 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Multi-threaded file copy engine that is used by the installer.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import errno
+import hashlib
+import itertools
+import mmap
+import os
+import queue
+import stat
+import sys
+import threading
+import time
+
+try:
+  from os import scandir
+except ImportError:
+  # Python < 3.5
+  from scandir import scandir
+
+# BLAKE2 is only available in Python 3.6 and newer.
+HASH_ALGORITHM = 'blake2b' if hasattr(hashlib, 'blake2b') else 'sha1'
+
+
+def stream_hash(fp, algorithm=HASH_ALGORITHM, bufsize=1024 * 1024,
+                progress=None, cancelled=None):
+  """
+  Returns the hex digest of the contents of the file object *fp*. The file
+  is read in chunks of *bufsize* bytes and *progress* is called with the
+  size of every chunk. Returns None if *cancelled* returns True between
+  chunks.
+  """
+
+  hasher = hashlib.new(algorithm)
+  while True:
+    if cancelled and cancelled():
+      return None
+    buf = fp.read(bufsize)
+    if not buf:
+      break
+    hasher.update(buf)
+    if progress:
+      progress(len(buf))
+  return hasher.hexdigest()
+
+
+def file_hash(filename, algorithm=HASH_ALGORITHM, bufsize=1024 * 1024,
+              progress=None, cancelled=None):
+  """
+  Returns the hex digest of the contents of *filename*. See
+  :func:`stream_hash`.
+  """
+
+  with open(filename, 'rb') as fp:
+    return stream_hash(fp, algorithm, bufsize, progress, cancelled)
+
+
+def verify_files(items, workers=1, cancelled=None, progress=None, manifest=None,
+                 payload=None):
+  """
+  Checks that the target files of the ``(source, target, size)`` *items*
+  have the same contents as their source files using a pool of *workers*
+  threads. The expected hash is taken from the *manifest* if it lists the
+  source file, otherwise the source file (or its member in the *payload*)
+  is hashed as well.
+
+  Returns a list of the target files that do not match. If *cancelled*
+  returns True, the remaining files are not checked.
+  """
+
+  def verify(from_, to, size):
+    if cancelled and cancelled():
+      return None
+    expected = manifest.hash(from_) if manifest else None
+    algorithm = manifest.algorithm if expected else HASH_ALGORITHM
+    member = payload.member(from_) if payload and not expected else None
+    if member is not None:
+      with payload.open(member) as fp:
+        expected = stream_hash(fp, algorithm, progress=progress, cancelled=cancelled)
+    elif not expected:
+      expected = file_hash(from_, algorithm, progress=progress, cancelled=cancelled)
+    actual = file_hash(to, algorithm, progress=progress, cancelled=cancelled)
+    if expected is None or actual is None:
+      return None
+    return None if actual == expected else to
+
+  with concurrent.futures.ThreadPoolExecutor(max(1, int(workers))) as executor:
+    futures = [executor.submit(verify, *item) for item in items]
+    return [to for to in (f.result() for f in futures) if to is not None]
+
+
+def iter_files(from_, to):
+  """
+  Given two paths *from_* and *to*, returns a generator that yields
+  triples of the absolute source and target filenames and the size of
+  the source file. If *from_* is a directory, *to* will also be assumed
+  to be a directory.
+
+  The directory tree is walked iteratively with :func:`os.scandir`, thus
+  the file type is usually known without an additional ``stat()`` call
+  and deep trees do not run into the recursion limit.
+
+  :raise FileNotFoundError: If *from_* or *to* are not absolute paths
+    or if *from_* or any entry in its tree is neither a file nor a
+    directory.
+  """
+
+  if not os.path.isabs(from_):
+    raise FileNotFoundError(from_)
+  if not os.path.isabs(to):
+    raise FileNotFoundError(to)
+
+  try:
+    st = os.stat(from_)
+  except FileNotFoundError:
+    raise FileNotFoundError(from_)
+  if stat.S_ISREG(st.st_mode):
+    yield (from_, to, st.st_size)
+    return
+  elif not stat.S_ISDIR(st.st_mode):
+    raise FileNotFoundError(from_)
+
+  stack = [(from_, to)]
+  while stack:
+    from_, to = stack.pop()
+    dirs = []
+    for entry in scandir(from_):
+      if entry.is_file():
+        yield (entry.path, os.path.join(to, entry.name), entry.stat().st_size)
+      elif entry.is_dir():
+        dirs.append((entry.path, os.path.join(to, entry.name)))
+      else:
+        raise FileNotFoundError(entry.path)
+    stack.extend(reversed(dirs))
+
+
+def remove_paths(paths, workers=1, callback=None, batchsize=256):
+  """
+  Removes the files and empty directories in *paths*. The files are removed
+  by a pool of *workers* threads in batches of *batchsize* paths. Paths
+  that turn out to be directories are removed afterwards in a single pass,
+  deepest first. *paths* may be an iterator, it is consumed one batch at
+  a time.
+
+  *callback* is invoked for every path with the path and None, or the
+  :class:`OSError` if it could not be removed. It may be called from the
+  worker threads. Returns the number of paths that could not be removed.
+  """
+
+  lock = threading.Lock()
+  dirs = []
+  errors = [0]
+
+  def report(path, exc):
+    if exc is not None:
+      with lock:
+        errors[0] += 1
+    if callback:
+      callback(path, exc)
+
+  def remove_batch(batch):
+    for path in batch:
+      try:
+        os.remove(path)
+      except OSError as exc:
+        if os.path.isdir(path):
+          with lock:
+            dirs.append(path)
+        else:
+          report(path, exc)
+      else:
+        report(path, None)
+
+  workers = max(1, int(workers))
+  paths = iter(paths)
+  with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+    pending = collections.deque()
+    while True:
+      batch = list(itertools.islice(paths, batchsize))
+      if not batch:
+        break
+      pending.append(executor.submit(remove_batch, batch))
+      if len(pending) >= 2 * workers:
+        pending.popleft().result()
+    for future in pending:
+      future.result()
+
+  dirs.sort(key=lambda x: os.path.normpath(x).count(os.sep), reverse=True)
+  for path in dirs:
+    try:
+      os.rmdir(path)
+    except OSError as exc:
+      report(path, exc)
+    else:
+      report(path, None)
+  return errors[0]
+
+
+def _write_all(dst, data):
+  # The targets are unbuffered, a raw write may write fewer bytes.
+  while data:
+    n = dst.write(data)
+    data = data[n:]
+
+
+def copy_buffered(src, dst, bufsize):
+  """
+  Copies from the file object *src* to *dst* through a reusable buffer of
+  *bufsize* bytes. Like all copy backends, this is a generator that yields
+  the number of bytes copied for every chunk.
+  """
+
+  buf = bytearray(bufsize)
+  view = memoryview(buf)
+  while True:
+    n = src.readinto(buf)
+    if not n:
+      break
+    _write_all(dst, view[:n])
+    yield n
+
+
+def copy_fanout(src, dsts, bufsize):
+  """
+  Copies from *src* to every file object in the list *dsts*. Every chunk
+  is read once and written to all targets. Yields the number of bytes
+  written to all targets for every chunk.
+  """
+
+  buf = bytearray(bufsize)
+  view = memoryview(buf)
+  while True:
+    n = src.readinto(buf)
+    if not n:
+      break
+    for dst in dsts:
+      _write_all(dst, view[:n])
+    yield n * len(dsts)
+
+
+def copy_mmap(src, dst, bufsize):
+  """
+  Copies from *src* to *dst* by writing slices of a memory-mapped view of
+  the source file.
+  """
+
+  size = os.fstat(src.fileno()).st_size - src.tell()
+  if size <= 0:
+    return
+  with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+    offset = src.tell()
+    view = memoryview(mapped)
+    try:
+      while offset < len(mapped):
+        n = dst.write(view[offset:offset + bufsize])
+        offset += n
+        yield n
+    finally:
+      view.release()
+    src.seek(offset)
+
+
+def copy_sendfile(src, dst, bufsize):
+  """
+  Copies from *src* to *dst* in the kernel with :func:`os.sendfile`. Only
+  supported on Linux, where the target may be a regular file.
+  """
+
+  offset = src.tell()
+  try:
+    while True:
+      n = os.sendfile(dst.fileno(), src.fileno(), offset, bufsize)
+      if not n:
+        break
+      offset += n
+      yield n
+  finally:
+    src.seek(offset)
+
+
+def copy_file_range(src, dst, bufsize):
+  """
+  Copies from *src* to *dst* in the kernel with :func:`os.copy_file_range`,
+  which also allows the file system to share the data blocks (reflinks).
+  """
+
+  while True:
+    n = os.copy_file_range(src.fileno(), dst.fileno(), bufsize)
+    if not n:
+      break
+    yield n
+
+
+COPY_BACKENDS = collections.OrderedDict()
+if hasattr(os, 'copy_file_range'):
+  COPY_BACKENDS['copy_file_range'] = copy_file_range
+if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+  COPY_BACKENDS['sendfile'] = copy_sendfile
+COPY_BACKENDS['mmap'] = copy_mmap
+COPY_BACKENDS['buffered'] = copy_buffered
+
+# Errors of the kernel copy functions after which the copy is continued
+# with the buffered backend, eg. if the file system does not support it.
+_FALLBACK_ERRNOS = set(getattr(errno, x) for x in ('EXDEV', 'ENOSYS',
+    'EINVAL', 'EOPNOTSUPP', 'ENOTSUP', 'EBADF') if hasattr(errno, x))
+
+
+class CopyEngine(object):
+  """
+  Copies ``(source, dest)`` pairs that are passed to :meth:`put` with a
+  pool of worker threads. If *maxsize* is specified, :meth:`put` blocks
+  while that many files are queued, which allows the caller to produce
+  the file list while it is being copied.
+
+  Destination directories are created by the thread that calls :meth:`put`,
+  thus :attr:`createdDirs` is always in creation order (parents before
+  their children). :attr:`installedFiles` is updated by the workers as
+  soon as they start writing a file, so it is complete no matter in which
+  order the workers finish or whether a copy failed half-way.
+
+  If *incremental* is enabled, files that already exist at the target and
+  have the same size and modification time as the source (or the same
+  contents if *incremental* is ``'hash'``) are not copied but added to
+  :attr:`skippedFiles` instead. Copied files always get the modification
+  time of their source.
+
+  The target of a file that is passed to :meth:`put` may also be a tuple
+  of several targets. The source is then read only once and every chunk
+  is written to all targets with :func:`copy_fanout`. The resume and
+  incremental checks, the *callback* and the lists of files are handled
+  for every target separately.
+
+  Files are copied in chunks of :attr:`bufsize` bytes with one of the
+  :data:`COPY_BACKENDS`. Files that are in the *payload* are extracted
+  from the archive instead. If the copy process is cancelled, the workers stop
+  between two chunks and the partially copied file is left in
+  :attr:`installedFiles`.
+
+  :param workers: The number of worker threads.
+  :param cancelled: A callable that returns True if the copy process was
+    cancelled. Workers will not start copying any new files after that.
+  :param callback: A callable that is invoked from a worker thread with
+    the source and target filename, the size of the file and whether the
+    file was skipped after it has been copied.
+  :param log: A callable that is invoked with a message for every
+    directory that has been created.
+  :param maxsize: The maximum number of files in the queue, or zero
+    for an unbounded queue.
+  :param progress: A callable that is invoked from a worker thread with
+    the number of bytes that have just been written, once for every
+    chunk of :attr:`bufsize` bytes (summed over all targets of the file).
+    For skipped files, it is invoked once with the file size.
+  :param incremental: False, True to compare size and modification time
+    or ``'hash'`` to compare the size and the file contents.
+  :param manifest: A :class:`manifest.Manifest` to look up the hashes of
+    the source files instead of computing them.
+  :param backend: The name of one of the :data:`COPY_BACKENDS` or
+    ``'auto'`` to use the first one that is available on this platform.
+  :param payload: A :class:`payload.Payload` that contains the source
+    files, or None if they are all on the file system.
+  :param stage: A callable that returns the path in a staging directory
+    that a target file is to be written to, or None to write it to the
+    target directly. :attr:`installedFiles` and :attr:`createdDirs` always
+    contain the target paths, directories are only created in the staging
+    directory.
+  :param resume: A callable that is invoked from a worker thread with the
+    source and target filename and the size of the file before it is
+    copied. If it returns True, the file is already complete from an
+    interrupted installation. It is added to :attr:`installedFiles` without
+    being copied again and *callback* is not invoked.
+  """
+
+  bufsize = 1024 * 1024
+
+  def __init__(self, workers=1, cancelled=None, callback=None, log=None,
+               maxsize=0, progress=None, incremental=False, manifest=None,
+               backend='auto', payload=None, stage=None, resume=None):
+    if backend == 'auto':
+      backend = next(iter(COPY_BACKENDS))
+    elif backend not in COPY_BACKENDS:
+      raise ValueError('unsupported copy backend: {!r}'.format(backend))
+    self._workers = max(1, int(workers))
+    self._cancelled = cancelled or (lambda: False)
+    self._callback = callback
+    self._log = log
+    self._progress = progress
+    self._incremental = incremental
+    self._manifest = manifest
+    self._backend = COPY_BACKENDS[backend]
+    self._payload = payload
+    self._stage = stage
+    self._resume = resume
+    self._plannedDirs = set()
+    self._queue = queue.Queue(maxsize)
+    self._lock = threading.Lock()
+    self._threads = []
+    self._stopped = False
+    self._error = None
+    self.installedFiles = []
+    self.skippedFiles = []
+    self.createdDirs = []
+
+  def _worker(self):
+    while True:
+      item = self._queue.get()
+      try:
+        if item is None:
+          return
+        if self._stopped or self._cancelled() or self.error():
+          continue
+        try:
+          self._copy(*item)
+        except BaseException as exc:
+          with self._lock:
+            if self._error is None:
+              self._error = exc
+      finally:
+        self._queue.task_done()
+
+  def _member(self, from_):
+    return self._payload.member(from_) if self._payload else None
+
+  def _unchanged(self, from_, to):
+    try:
+      dst = os.stat(to)
+    except FileNotFoundError:
+      return False
+    member = self._member(from_)
+    if member is not None:
+      size, mtime = member.file_size, self._payload.mtime(member)
+    else:
+      src = os.stat(from_)
+      size, mtime = src.st_size, src.st_mtime
+    if size != dst.st_size:
+      return False
+    if self._incremental == 'hash':
+      expected = self._manifest.hash(from_) if self._manifest else None
+      if expected:
+        return file_hash(to, self._manifest.algorithm) == expected
+      if member is not None:
+        with self._payload.open(member) as fp:
+          return stream_hash(fp) == file_hash(to)
+      return file_hash(from_) == file_hash(to)
+    # FAT file systems and zip archives store the modification time with
+    # a 2 second resolution.
+    return abs(mtime - dst.st_mtime) < 2.0
+
+  def _size(self, from_):
+    member = self._member(from_)
+    return member.file_size if member is not None else os.path.getsize(from_)
+
+  def _done(self, from_, to, size):
+    # Returns True if *to* does not need to be copied because it is
+    # complete from an interrupted installation or unchanged.
+    if self._resume and self._resume(from_, to, size):
+      if size is None:
+        size = self._size(from_)
+      with self._lock:
+        self.installedFiles.append(to)
+      if self._progress and size:
+        self._progress(size)
+      return True
+
+    if self._incremental and self._unchanged(from_, to):
+      if size is None:
+        size = self._size(from_)
+      with self._lock:
+        self.skippedFiles.append(to)
+      if self._progress and size:
+        self._progress(size)
+      if self._callback:
+        self._callback(from_, to, size, True)
+      return True
+    return False
+
+  def _copy(self, from_, to, size=None):
+    targets = [to] if isinstance(to, str) else to
+    targets = [x for x in targets if not self._done(from_, x, size)]
+    if not targets:
+      return
+
+    member = self._member(from_)
+    if member is not None:
+      src, backend = self._payload.open(member), copy_buffered
+    else:
+      src, backend = open(from_, 'rb', buffering=0), self._backend
+    paths = [(self._stage(x) if self._stage else None) or x for x in targets]
+    with src, contextlib.ExitStack() as stack:
+      dsts = []
+      for target, path in zip(targets, paths):
+        dsts.append(stack.enter_context(open(path, 'wb', buffering=0)))
+        with self._lock:
+          self.installedFiles.append(target)
+      if len(dsts) == 1:
+        if not self._copyChunks(src, dsts[0], backend):
+          return
+      elif not self._copyChunks(src, dsts, copy_fanout):
+        return
+      if size is None:
+        size = dsts[0].tell()
+      if member is not None:
+        atime = mtime = self._payload.mtime(member)
+      else:
+        st = os.fstat(src.fileno())
+        atime, mtime = st.st_atime, st.st_mtime
+    for path in paths:
+      os.utime(path, (atime, mtime))
+    if self._callback:
+      for target in targets:
+        self._callback(from_, target, size, False)
+
+  def _copyChunks(self, src, dst, backend):
+    # Returns False if the copy process was cancelled.
+    while True:
+      try:
+        for n in backend(src, dst, self.bufsize):
+          if self._progress:
+            self._progress(n)
+          if self._cancelled() or self._stopped:
+            return False
+        return True
+      except OSError as exc:
+        if backend in (copy_buffered, copy_fanout) or exc.errno not in _FALLBACK_ERRNOS:
+          raise
+        # Continue where the kernel copy stopped.
+        src.seek(dst.tell())
+        backend = copy_buffered
+
+  def error(self):
+    with self._lock:
+      return self._error
+
+  def raiseError(self):
+    error = self.error()
+    if error is not None:
+      raise error
+
+  @staticmethod
+  def _missingDirs(path):
+    # Returns the directory *path* and its parents that do not exist,
+    # outermost first.
+    missing = []
+    while path and not os.path.isdir(path):
+      missing.append(path)
+      parent = os.path.dirname(path)
+      if parent == path:
+        break
+      path = parent
+    return missing[::-1]
+
+  def makedirs(self, path, record=True):
+    """
+    Creates the directory *path* and all its missing parents. Every
+    directory that is created is appended to :attr:`createdDirs` if
+    *record* is True.
+    """
+
+    for path in self._missingDirs(path):
+      os.mkdir(path)
+      if record:
+        self.createdDirs.append(path)
+        if self._log:
+          self._log('Created directory:', path)
+
+  def start(self):
+    if self._threads:
+      raise RuntimeError("already started")
+    for i in range(self._workers):
+      thread = threading.Thread(target=self._worker)
+      thread.daemon = True
+      thread.start()
+      self._threads.append(thread)
+
+  def put(self, from_, to, size=None):
+    """
+    Queue the file *from_* to be copied to *to*, which may also be a tuple
+    of several targets. The target directories are created immediately.
+    Raises the error of a previously failed copy operation, if any. *size*
+    is passed to the callback, if it is not specified the number of bytes
+    copied is passed instead.
+    """
+
+    self.raiseError()
+    for target in ([to] if isinstance(to, str) else to):
+      staged = self._stage(target) if self._stage else None
+      if staged:
+        # Record the target directories that will be created by the commit.
+        for path in self._missingDirs(os.path.dirname(target)):
+          if path not in self._plannedDirs:
+            self._plannedDirs.add(path)
+            self.createdDirs.append(path)
+        self.makedirs(os.path.dirname(staged), record=False)
+      else:
+        self.makedirs(os.path.dirname(target))
+    self._queue.put((from_, to, size))
+
+  def join(self):
+    """
+    Wait until all queued files have been copied and stop the workers.
+    Raises the first error that occured in any of the workers.
+    """
+
+    for thread in self._threads:
+      self._queue.put(None)
+    for thread in self._threads:
+      thread.join()
+    self._threads = []
+    self.raiseError()
+
+  def shutdown(self):
+    """
+    Stop the workers without copying the files that are still queued. Files
+    that are currently being copied are completed first. Does not raise.
+    """
+
+    self._stopped = True
+    try:
+      self.join()
+    except BaseException:
+      pass
+
+
+class ThroughputMeter(object):
+  """
+  Computes a smoothed transfer rate and the estimated time remaining. A
+  new sample is only taken if at least *interval* seconds passed since
+  the last sample and the rate is smoothed with an exponential moving
+  average using the *smoothing* factor.
+  """
+
+  def __init__(self, interval=0.5, smoothing=0.3):
+    self.interval = interval
+    self.smoothing = smoothing
+    self.rate = None
+    self._lastTime = None
+    self._lastBytes = 0
+
+  def reset(self, bytesDone=0):
+    self.rate = None
+    self._lastTime = time.monotonic()
+    self._lastBytes = bytesDone
+
+  def update(self, bytesDone):
+    """
+    Update the meter with the total number of bytes that are done. Returns
+    True if a new sample was taken and :attr:`rate` was updated.
+    """
+
+    now = time.monotonic()
+    if self._lastTime is None:
+      self.reset(bytesDone)
+      return False
+    elapsed = now - self._lastTime
+    if elapsed < self.interval:
+      return False
+    rate = (bytesDone - self._lastBytes) / elapsed
+    if self.rate is None:
+      self.rate = rate
+    else:
+      self.rate = self.smoothing * rate + (1.0 - self.smoothing) * self.rate
+    self._lastTime = now
+    self._lastBytes = bytesDone
+    return True
+
+  def eta(self, bytesDone, bytesTotal):
+    """
+    Returns the estimated number of seconds remaining, or None if the
+    rate is not known yet.
+    """
+
+    if not self.rate:
+      return None
+    return max(bytesTotal - bytesDone, 0) / self.rate
@@ -0,0 +1,433 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Runs the installers of the dependencies, concurrently where they allow
+it, with timeouts and their output forwarded to the installation log.
+Dependencies that are already installed are detected with probes or a
+cache of the installers that succeeded before, and are skipped.
+"""
+
+from .copyengine import file_hash
+
+import collections
+import hashlib
+import json
+import locale
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+
+CACHE_VERSION = 1
+
+DependencyResult = collections.namedtuple('DependencyResult', 'returncode duration timedout skipped')
+DependencyResult.__new__.__defaults__ = (False,)
+
+
+class InstallDependency(object):
+  """
+  A dependency installer that is run with *command*. It succeeded if it
+  exits with one of the *returncodes*.
+
+  :param ident: The identifier that other dependencies reference in their
+    *after* list. Defaults to the *name*.
+  :param after: The identifiers of the dependencies that must have been
+    installed successfully before this one is started.
+  :param parallel: If True, the dependency may run at the same time as
+    other parallel dependencies. Otherwise it runs alone, which is the
+    safe choice for installers that take a system-wide lock (eg. MSI).
+  :param timeout: The number of seconds after which the installer is
+    killed and considered failed, or None.
+  :param overlap: If True, the dependency does not need the installed
+    files and may run while the files are being copied.
+  :param detect: A dictionary that describes how to detect whether the
+    dependency is already installed, see :func:`detect_installed`.
+  """
+
+  def __init__(self, name, command, returncodes, ident=None, after=(),
+               parallel=False, timeout=None, overlap=False, detect=None):
+    self.name = name
+    self.command = command
+    self.returncodes = returncodes
+    self.ident = ident or name
+    self.after = list(after)
+    self.parallel = parallel
+    self.timeout = timeout
+    self.overlap = overlap
+    self.detect = detect
+
+
+def _version(string):
+  return tuple(int(x) for x in re.findall(r'\d+', string))
+
+
+def detect_installed(detect):
+  """
+  Returns True if all of the conditions in the *detect* dictionary are
+  met. Supported keys are:
+
+  - ``file``: A file or directory that must exist.
+  - ``version_file``: A file that must exist and, if ``version`` is
+    specified, contain a version number that is at least ``version``.
+  - ``command``: A command that must exit with one of the ``returncodes``
+    (defaults to ``[0]``) within ``timeout`` seconds (defaults to 30).
+
+  Returns False if *detect* is empty.
+  """
+
+  if not detect:
+    return False
+  if 'file' in detect and not os.path.exists(detect['file']):
+    return False
+  if 'version_file' in detect:
+    try:
+      with open(detect['version_file']) as fp:
+        version = fp.read().strip()
+    except OSError:
+      return False
+    if 'version' in detect and _version(version) < _version(detect['version']):
+      return False
+  if 'command' in detect:
+    try:
+      returncode = subprocess.call(detect['command'], stdin=subprocess.DEVNULL,
+          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+          timeout=detect.get('timeout', 30))
+    except (OSError, subprocess.TimeoutExpired):
+      return False
+    if returncode not in detect.get('returncodes', [0]):
+      return False
+  return True
+
+
+class DependencyCache(object):
+  """
+  Remembers the dependency installers that finished successfully on this
+  machine in the JSON file *filename*. The installers are identified by
+  the hash of the installer file and their arguments, so a new version of
+  a redistributable is installed again, and installers that share an
+  executable (eg. ``/usr/sbin/installer -pkg A.pkg``) are told apart.
+  """
+
+  def __init__(self, filename):
+    self.filename = filename
+    self.installed = {}
+    self._lock = threading.Lock()
+    self._modified = False
+    try:
+      with open(filename) as fp:
+        data = json.load(fp)
+      if data.get('version') == CACHE_VERSION:
+        self.installed = data['installed']
+    except (OSError, ValueError, KeyError):
+      pass
+
+  @staticmethod
+  def key(dep):
+    """
+    Returns the key of *dep* in the cache, or None if its command does
+    not run an installer file that can be hashed. The key covers the hash
+    of the executable, the arguments and the hashes of the arguments that
+    are files.
+    """
+
+    if not dep.command or not os.path.isfile(dep.command[0]):
+      return None
+    parts = [file_hash(dep.command[0])]
+    for arg in dep.command[1:]:
+      parts.append(arg)
+      if os.path.isfile(arg):
+        parts.append(file_hash(arg))
+    return hashlib.sha256(json.dumps(parts).encode('utf8')).hexdigest()
+
+  def __contains__(self, key):
+    with self._lock:
+      return key in self.installed
+
+  def add(self, key, dep, returncode):
+    with self._lock:
+      self.installed[key] = {'name': dep.name, 'returncode': returncode,
+          'time': int(time.time())}
+      self._modified = True
+
+  def save(self):
+    """
+    Writes the cache if it was modified. Errors are ignored, the cache
+    is only an optimization.
+    """
+
+    with self._lock:
+      if not self._modified:
+        return
+      data = {'version': CACHE_VERSION, 'installed': self.installed}
+      try:
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename + '.tmp', 'w') as fp:
+          json.dump(data, fp)
+        os.replace(self.filename + '.tmp', self.filename)
+      except OSError as exc:
+        print('Warning: Could not save the dependency cache:', exc)
+        return
+      self._modified = False
+
+
+def split_dependencies(dependencies):
+  """
+  Splits *dependencies* into the ones that must be installed before the
+  files are copied and the ones that may run while they are copied. A
+  dependency that overlaps with copying is still installed before if a
+  dependency that does not overlap must run after it.
+  """
+
+  byIdent = {dep.ident: dep for dep in dependencies}
+  before = set()
+  stack = [dep for dep in dependencies if not dep.overlap]
+  while stack:
+    dep = stack.pop()
+    if dep.ident not in before:
+      before.add(dep.ident)
+      stack.extend(byIdent[x] for x in dep.after if x in byIdent)
+  return ([dep for dep in dependencies if dep.ident in before],
+          [dep for dep in dependencies if dep.ident not in before])
+
+
+class DependencyRunner(object):
+  """
+  Runs the *dependencies*, at most *workers* at the same time. A
+  dependency is started once all dependencies in its *after* list have
+  been installed successfully and, unless it is *parallel*, when no other
+  dependency is running.
+
+  After a dependency failed or if *cancelled* returns True, no further
+  dependencies are started but the ones that are running are waited for.
+  :attr:`results` maps the identifiers of the dependencies that have been
+  run to a :class:`DependencyResult` with the wall-time in seconds.
+
+  A dependency is skipped if its *detect* probe says that it is already
+  installed. Dependencies without a probe are skipped if their installer
+  is in the *cache*, a :class:`DependencyCache`. The installers that
+  succeed are added to the cache.
+
+  :param log: A callable that is invoked like ``print()`` with the output
+    of the installers and the result of every dependency. It is called
+    from the threads that run the installers.
+  :param progress: A callable that is invoked with the number of finished
+    dependencies and the total number of dependencies.
+  :param satisfied: The identifiers of dependencies that an earlier runner
+    has installed already. The *after* lists may reference them.
+  :raise ValueError: If a dependency is to run after an unknown one.
+  """
+
+  pollInterval = 0.1
+
+  #: The number of seconds to wait for the rest of the output after an
+  #: installer exited. A process that it started may still hold the pipe.
+  outputTimeout = 5.0
+
+  def __init__(self, dependencies, workers=1, log=None, cancelled=None, progress=None,
+               cache=None, satisfied=()):
+    self._satisfied = set(satisfied)
+    idents = set(dep.ident for dep in dependencies) | self._satisfied
+    for dep in dependencies:
+      for ident in dep.after:
+        if ident not in idents:
+          raise ValueError('dependency {!r} is to run after unknown dependency {!r}'
+              .format(dep.ident, ident))
+    self.dependencies = list(dependencies)
+    self.results = collections.OrderedDict()
+    self._byIdent = {dep.ident: dep for dep in self.dependencies}
+    self._workers = max(1, int(workers))
+    self._log = log or print
+    self._cancelled = cancelled or (lambda: False)
+    self._progress = progress
+    self._cache = cache
+    self._cond = threading.Condition()
+    self._running = {}
+    self._failed = False
+    self._success = None
+    self._thread = None
+
+  def _succeeded(self, ident):
+    if ident in self._satisfied:
+      return True
+    result = self.results.get(ident)
+    return result is not None and (result.skipped or (not result.timedout and
+        result.returncode in self._byIdent[ident].returncodes))
+
+  def _canStart(self, dep):
+    if not all(self._succeeded(x) for x in dep.after):
+      return False
+    if not dep.parallel:
+      return not self._running
+    if len(self._running) >= self._workers:
+      return False
+    return all(x[0].parallel for x in self._running.values())
+
+  def _start(self, dep):
+    # Must be called with the condition held. The process is started by
+    # the thread, after checking whether the dependency is installed.
+    state = [dep, None, time.monotonic(), False]
+    self._running[dep.ident] = state
+    thread = threading.Thread(target=self._execute, args=(state,))
+    thread.daemon = True
+    thread.start()
+
+  def _installed(self, dep):
+    # Returns the reason why *dep* does not need to be installed, or None
+    # and the key of the dependency in the cache.
+    if dep.detect:
+      return ('detected', None) if detect_installed(dep.detect) else (None, None)
+    key = self._cache.key(dep) if self._cache is not None else None
+    return ('cached', key) if key is not None and key in self._cache else (None, key)
+
+  def _execute(self, state):
+    dep = state[0]
+    try:
+      reason, key = self._installed(dep)
+    except OSError as exc:
+      self._log('  Warning: Could not check if {} is installed: {}'.format(dep.name, exc))
+      reason, key = None, None
+    if reason:
+      self._log('Dependency already installed ({}): {}'.format(reason, dep.name))
+      self._done(state, DependencyResult(None, time.monotonic() - state[2], False, True))
+      return
+
+    self._log('Installing dependency:', dep.name)
+    self._log('  Command:', ' '.join(map(shlex.quote, dep.command)))
+    try:
+      proc = subprocess.Popen(dep.command, stdin=subprocess.DEVNULL,
+          stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except OSError as exc:
+      self._log('  Error: Could not run {}: {}'.format(dep.name, exc))
+      self._done(state, DependencyResult(None, 0.0, False))
+      return
+    with self._cond:
+      state[1] = proc
+      state[2] = time.monotonic()
+    # The output is read in a separate thread. Waiting for the end of the
+    # output would block forever if a process that the installer started
+    # keeps the pipe open, even after the installer was killed.
+    reader = threading.Thread(target=self._forward, args=(dep, proc.stdout))
+    reader.daemon = True
+    reader.start()
+    returncode = proc.wait()
+    reader.join(self.outputTimeout)
+    result = DependencyResult(returncode, time.monotonic() - state[2], state[3])
+    if key is not None and not result.timedout and returncode in dep.returncodes:
+      self._cache.add(key, dep, returncode)
+    self._done(state, result)
+
+  def _forward(self, dep, stream):
+    encoding = locale.getpreferredencoding(False)
+    with stream:
+      for line in iter(stream.readline, b''):
+        self._log('  [{}] {}'.format(dep.name, line.decode(encoding, 'replace').rstrip()))
+
+  def _done(self, state, result):
+    with self._cond:
+      del self._running[state[0].ident]
+      self._finish(state[0], result)
+      self._cond.notify_all()
+
+  def _finish(self, dep, result):
+    # Must be called with the condition held.
+    self.results[dep.ident] = result
+    if result.skipped:
+      pass
+    elif result.returncode is None:
+      self._failed = True
+    elif result.timedout:
+      self._log('  Error: {} timed out after {:.1f}s'.format(dep.name, result.duration))
+      self._failed = True
+    elif result.returncode not in dep.returncodes:
+      self._log('  Error: Unexpected returncode of {}: {}'.format(dep.name, result.returncode))
+      self._failed = True
+    else:
+      self._log('  {} finished with returncode {} in {:.1f}s'.format(
+          dep.name, result.returncode, result.duration))
+    if self._progress:
+      self._progress(len(self.results), len(self.dependencies))
+
+  def _killTimedOut(self):
+    # Must be called with the condition held.
+    now = time.monotonic()
+    for state in self._running.values():
+      dep, proc, started, timedout = state
+      if proc is None:
+        continue
+      if dep.timeout is not None and not timedout and now - started > dep.timeout:
+        state[3] = True
+        proc.kill()
+
+  def run(self):
+    """
+    Runs the dependencies and blocks until all of them are done. Returns
+    True if all dependencies were installed successfully.
+    """
+
+    pending = list(self.dependencies)
+    with self._cond:
+      while True:
+        if not self._failed and not self._cancelled():
+          for dep in list(pending):
+            if self._canStart(dep):
+              pending.remove(dep)
+              self._start(dep)
+            elif not dep.parallel and all(self._succeeded(x) for x in dep.after):
+              # Do not start any later dependencies before this one, it
+              # would never get to run alone otherwise.
+              break
+        if not self._running:
+          break
+        self._cond.wait(self.pollInterval)
+        self._killTimedOut()
+    if self._cache is not None:
+      self._cache.save()
+    if pending and not self._failed and not self._cancelled():
+      self._log('Error: Dependencies can not be ordered:', ', '.join(x.name for x in pending))
+      self._failed = True
+    return not self._failed and not pending
+
+  def start(self):
+    """
+    Runs the dependencies in a background thread. Use :meth:`join` to
+    wait for them.
+    """
+
+    if self._thread:
+      raise RuntimeError("already started")
+    def target():
+      try:
+        self._success = self.run()
+      except BaseException as exc:
+        self._log('Error: Could not install dependencies:', exc)
+        self._success = False
+    self._thread = threading.Thread(target=target)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def started(self):
+    return self._thread is not None
+
+  def join(self):
+    """
+    Waits for the dependencies that were started with :meth:`start`.
+    Returns True if all of them were installed successfully.
+    """
+
+    self._thread.join()
+    return self._success
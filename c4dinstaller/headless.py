@@ -0,0 +1,221 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Installs without any windows, for deployment to many machines. The
+target directory, the features and overrides of the ``"install"`` options
+are read from the command-line or an answer file. Every event is printed
+as a JSON object on a line of its own to stdout, everything else that is
+printed goes to stderr.
+
+The answer file is a JSON object like this, the ``"target"`` may also
+be a list of directories to install into in one run::
+
+  {
+    "target": "C:\\Program Files\\MAXON\\CINEMA 4D R18",
+    "features": ["plugin", "docs"],
+    "install": {"workers": 8, "verify": true}
+  }
+"""
+
+from . import read_config, read_strings
+from .installengine import InstallEngine
+from .installplan import all_features, install_options
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_CANCELLED = 3
+
+
+class UsageError(Exception):
+  pass
+
+
+def _parse_option(string):
+  key, sep, value = string.partition('=')
+  if not sep or not key:
+    raise argparse.ArgumentTypeError('expected KEY=VALUE, got {!r}'.format(string))
+  try:
+    value = json.loads(value)
+  except ValueError:
+    pass
+  return key, value
+
+
+def get_argument_parser():
+  parser = argparse.ArgumentParser(prog='installer --headless',
+      description='Installs the plugin without showing the installer window.')
+  parser.add_argument('-a', '--answers', metavar='FILE',
+      help='a JSON file with the "target", "features" and "install" options')
+  parser.add_argument('-t', '--target', metavar='PATH', action='append',
+      help='the Cinema 4D directory to install to, may be specified '
+           'multiple times to install into several directories')
+  parser.add_argument('-f', '--features', metavar='LIST',
+      help='comma separated features to install (default: all)')
+  parser.add_argument('-o', '--option', metavar='KEY=VALUE', action='append',
+      type=_parse_option, default=[],
+      help='override an option of the "install" configuration, the value '
+           'is parsed as JSON if possible (eg. -o workers=8)')
+  parser.add_argument('-q', '--quiet', action='store_true',
+      help='do not print the log messages of the installation')
+  return parser
+
+
+def _resolve(args, config):
+  """
+  Merges the answer file and the command-line arguments into the list of
+  target paths and the list of features. The ``"install"`` options are updated
+  in *config*.
+  """
+
+  answers = {}
+  if args.answers:
+    try:
+      with open(args.answers) as fp:
+        answers = json.load(fp)
+    except (OSError, ValueError) as exc:
+      raise UsageError('could not read answer file: {}'.format(exc))
+
+  targets = args.target or answers.get('target')
+  if isinstance(targets, str):
+    targets = [targets]
+  if not targets:
+    raise UsageError('no target directory specified')
+  targets = [os.path.abspath(x) for x in targets]
+  for target in targets:
+    if not os.path.isdir(target):
+      raise UsageError('the target directory "{}" does not exist'.format(target))
+  if len(set(map(os.path.normcase, targets))) != len(targets):
+    raise UsageError('the same target directory is specified more than once')
+
+  available = all_features(config)
+  if args.features is not None:
+    selected = [x.strip() for x in args.features.split(',') if x.strip()]
+  else:
+    selected = answers.get('features')
+  if selected is None:
+    selected = [ident for ident, _, _ in available]
+  unknown = set(selected) - set(ident for ident, _, _ in available)
+  if unknown:
+    raise UsageError('unknown features: {}'.format(', '.join(sorted(unknown))))
+  features = [ident for ident, _, required in available if required or ident in selected]
+
+  install = config.setdefault('install', {})
+  install.update(answers.get('install', {}))
+  install.update(args.option)
+  return targets, features
+
+
+class Reporter(object):
+  """
+  Prints the events of an :class:`installengine.InstallEngine` as JSON
+  lines to *fp*. The methods are called from the installation thread.
+  """
+
+  def __init__(self, fp, quiet=False):
+    self.fp = fp
+    self.quiet = quiet
+    self.mode = None
+    self._lock = threading.Lock()
+
+  def emit(self, event, **data):
+    data['event'] = event
+    line = json.dumps(data, sort_keys=True)
+    with self._lock:
+      print(line, file=self.fp)
+      self.fp.flush()
+
+  def logUpdate(self, text):
+    if not self.quiet:
+      for line in text.rstrip('\n').split('\n'):
+        self.emit('log', message=line)
+
+  def progressUpdate(self, mode, progress):
+    if mode:
+      self.mode = mode
+    self.emit('progress', mode=self.mode, progress=round(progress, 4))
+
+  def throughputUpdate(self, bytesDone, bytesTotal, rate, eta):
+    self.emit('throughput', done=int(bytesDone), total=int(bytesTotal),
+        rate=round(rate, 1), eta=None if eta < 0 else round(eta, 1))
+
+
+def main(argv=None):
+  """
+  Runs the headless installer with the command-line arguments *argv* and
+  returns the exit code.
+  """
+
+  reporter = Reporter(sys.stdout)
+  parser = get_argument_parser()
+  try:
+    args = parser.parse_args(argv)
+  except SystemExit as exc:
+    return EXIT_USAGE if exc.code else EXIT_SUCCESS
+  reporter.quiet = args.quiet
+
+  # Events are the only output on stdout, the installer prints its
+  # diagnostic messages to stderr while it runs.
+  with contextlib.redirect_stdout(sys.stderr):
+    return _run(args, reporter)
+
+
+def _run(args, reporter):
+  try:
+    config = read_config()
+    targets, features = _resolve(args, config)
+    options = install_options(config, read_strings(), targets, features)
+  except (UsageError, KeyError, ValueError) as exc:
+    reporter.emit('result', status='usage', code=EXIT_USAGE, message=str(exc))
+    return EXIT_USAGE
+
+  reporter.emit('start', targets=targets, features=features)
+  engine = InstallEngine(**options)
+  engine.logUpdate.connect(reporter.logUpdate)
+  engine.progressUpdate.connect(reporter.progressUpdate)
+  engine.throughputUpdate.connect(reporter.throughputUpdate)
+
+  def cancel(signum, frame):
+    print('note: cancelling the installation (signal {})'.format(signum))
+    engine.cancel()
+  handlers = {signum: signal.signal(signum, cancel) for signum in (signal.SIGINT, signal.SIGTERM)}
+
+  try:
+    engine.start()
+    # Wait with a timeout so that the signal handlers can run.
+    while not engine.wait(0.2):
+      pass
+  finally:
+    for signum, handler in handlers.items():
+      signal.signal(signum, handler)
+
+  mode = engine.mode()
+  if mode == InstallEngine.Mode.Complete:
+    status, code = 'complete', EXIT_SUCCESS
+  elif mode == InstallEngine.Mode.Cancelled:
+    status, code = 'cancelled', EXIT_CANCELLED
+  else:
+    status, code = 'error', EXIT_FAILURE
+  reporter.emit('result', status=status, code=code)
+  return code
@@ -0,0 +1,998 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+The installation and uninstallation process. This module does not depend
+on Qt, see :mod:`installthread` for the Qt adapters that are used by the
+installer windows.
+"""
+
+from .dependencies import DependencyRunner, split_dependencies
+from .copyengine import (HASH_ALGORITHM, CopyEngine, ThroughputMeter, file_hash,
+    iter_files, remove_paths, stream_hash, verify_files)
+from .resume import ResumeJournal
+from .staging import Staging
+from .uninstalldata import Entry, UninstallDataReader, is_modified, write_uninstall_data
+
+import collections
+import os
+import time
+import threading
+import traceback
+import sys
+
+
+class Signal(object):
+  """
+  A list of callbacks that are invoked with the arguments passed to
+  :meth:`emit`, in the thread that emits the signal. Mimics the interface
+  of a bound ``pyqtSignal`` for direct connections.
+  """
+
+  def __init__(self):
+    self._callbacks = []
+    self._lock = threading.Lock()
+
+  def connect(self, callback):
+    with self._lock:
+      self._callbacks = self._callbacks + [callback]
+
+  def disconnect(self, callback):
+    with self._lock:
+      callbacks = list(self._callbacks)
+      callbacks.remove(callback)
+      self._callbacks = callbacks
+
+  def emit(self, *args):
+    for callback in self._callbacks:
+      callback(*args)
+
+
+class InstallCancelled(Exception):
+  pass
+
+
+class InstallAborted(Exception):
+  pass
+
+
+class InstallTarget(object):
+  """
+  A directory that an :class:`InstallEngine` installs into. The source
+  files of *copyfiles* must be the same for every target of an engine,
+  in the same order, only the target paths differ.
+
+  :param copyfiles: The ``(source, target)`` pairs for this target.
+  :param installedFilesListFn: The uninstall data file of this target.
+  :param staging: A :class:`staging.Staging` for this target, or None.
+  """
+
+  def __init__(self, copyfiles, installedFilesListFn=None, staging=None):
+    self.copyfiles = copyfiles
+    self.installedFilesListFn = installedFilesListFn
+    self.staging = staging
+
+  def __repr__(self):
+    return '<InstallTarget {!r}>'.format(self.installedFilesListFn)
+
+
+class InstallEngine(object):
+  """
+  This class implements the installation process. It gathers a list of all
+  files to be installed, then starts the installation process in a
+  background thread. If the installation is canceled, it can undo the
+  process.
+
+  :param copyfiles: A list of pairs that represent files to copy from the
+    source location (first element) to the second location (second element).
+    The elements may also point to directories.
+  :param slowdownProgress: For testing purposes, the minimum number of
+    seconds that every mode is displayed. Ignored in frozen builds.
+  :param workers: The number of threads that copy files concurrently.
+  :param pipeline: If True, the files are collected while they are already
+    being copied instead of collecting the full file list first. The
+    dependencies are installed before the files in this mode and the
+    copy progress is relative to the number of bytes that have been
+    discovered so far.
+  :param incremental: If True, files that already exist at the target
+    location with the same size and modification time are not copied
+    again. If ``'hash'``, the file contents are compared instead of the
+    modification time. Skipped files are still listed in the uninstall
+    information but are not removed when the installation is undone.
+  :param manifest: A :class:`manifest.Manifest` of the source files. The
+    files of sources that are listed in the manifest are not collected
+    from the file system and their hashes do not need to be computed.
+  :param verify: If True, the hashes of all copied files are compared to
+    their source (or the *manifest*) after they have been copied. The
+    installation is undone if any file does not match.
+  :param backend: The name of the :data:`copyengine.COPY_BACKENDS` to copy
+    files with, or ``'auto'``.
+  :param payload: A :class:`payload.Payload` archive. Sources that are in
+    the payload are extracted from it instead of being copied.
+  :param staging: A :class:`staging.Staging` to copy the files into
+    before they are moved to their target location.
+  :param resume: If True, the files that have been copied completely are
+    recorded in a journal next to the uninstall data file. If the
+    installation is interrupted, the next installation of the same files
+    does not copy the files again that still have the recorded size and
+    modification time. If ``'hash'``, their contents are compared to the
+    source (or the *manifest*) as well. Requires *installedFilesListFn*.
+  :param dependencyCache: A :class:`dependencies.DependencyCache` of the
+    dependency installers that have already been run successfully.
+  :param targets: A list of additional :class:`InstallTarget` objects to
+    install the same files into. Every source file is read once and
+    written to all targets, each target gets its own uninstall data file,
+    staging directory and resume journal. The dependencies are installed
+    once. The progress covers the bytes written to all targets. Files that
+    several targets install to the same path belong to the first of them.
+
+  .. todo:: Support glob patterns
+
+  Signals:
+
+  The signals are :class:`Signal` objects, their callbacks are invoked
+  from the installation thread and the copy workers.
+
+  The :attr:`logUpdate` and :attr:`progressUpdate` signals are emitted at
+  most :attr:`updatesPerSecond` times per second. Log messages are collected
+  in the meantime and only the latest progress is emitted. A change of the
+  mode is always emitted immediately.
+
+  .. signal:: logUpdate(text)
+
+    Emitted when something has been added to the installation log. Basically
+    acts like a ``print()`` function, but *text* may contain multiple lines.
+
+  .. signal:: progressUpdate(mode, progress)
+
+    Emitted when the progress changed. *mode* is None unless the mode changed.
+    The first time this signal is called, *mode* will be ``'collect'``, then
+    when the process is finished, *mode* will be ``'copy'``. In pipeline
+    mode, there is no ``'collect'`` mode. If the installer has to undo the
+    installed filed, *mode* will be ``'undo'``. The progress of the
+    ``'copy'`` mode is the number of bytes copied, including the bytes
+    of files that are still being copied, relative to the total size.
+    The same applies to the number of bytes hashed in ``'verify'`` mode.
+    With a :class:`staging.Staging`, the files are copied to the staging
+    directory and moved to the target in ``'commit'`` mode.
+
+  .. signal:: throughputUpdate(bytesDone, bytesTotal, rate, eta)
+
+    Emitted about twice a second while files are being copied or verified.
+    *rate* is the smoothed throughput in bytes per second and *eta* the
+    estimated number of seconds remaining, or -1 if it is not known yet.
+  """
+
+  updatesPerSecond = 30
+
+  class Mode:
+    Collect = 'collect'
+    Dependencies = 'dependencies'
+    Copy = 'copy'
+    Verify = 'verify'
+    FileList = 'filelist'
+    Commit = 'commit'
+    Undo = 'undo'
+    Complete = 'complete'
+    Cancelled = 'cancelled'
+    Error = 'error'
+
+  def __init__(self, copyfiles, dependencies, installedFilesListFn,
+               slowdownProgress=None, workers=1, pipeline=False, incremental=False,
+               manifest=None, verify=False, backend='auto', payload=None,
+               staging=None, resume=False, dependencyCache=None, targets=()):
+    self.logUpdate = Signal()
+    self.progressUpdate = Signal()
+    self.throughputUpdate = Signal()
+    self._targets = [InstallTarget(copyfiles, installedFilesListFn, staging)]
+    self._targets += targets
+    sources = [from_ for from_, _ in copyfiles]
+    for target in self._targets[1:]:
+      if [from_ for from_, _ in target.copyfiles] != sources:
+        raise ValueError('{!r} does not have the same source files'.format(target))
+    self._owners = {}
+    self._dependencies, self._overlapDependencies = split_dependencies(dependencies)
+    self._dependencyRunners = []
+    self._dependencyCache = dependencyCache
+    self._running = False
+    self._cancelled = False
+    self._thread = None
+    self._lock = threading.Lock()
+    self._mode = None
+    self._installedFiles = None
+    self._skippedFiles = None
+    self._createdDirs = None
+    self._slowdownProgress = None if getattr(sys, 'frozen', False) else slowdownProgress
+    self._modeStarted = None
+    self._workers = workers
+    self._pipeline = pipeline
+    self._incremental = incremental
+    self._manifest = manifest
+    self._verify = verify
+    self._backend = backend
+    self._payload = payload
+    self._committing = False
+    self._resume = resume
+    self._journals = []
+    self._journaledDirs = 0
+    self._verifyFiles = []
+    self._targetHashes = {}
+    self._doneBytes = 0
+    self._totalBytes = 0
+    self._meter = ThroughputMeter()
+    self._emitLock = threading.Lock()
+    self._pendingLog = []
+    self._pendingMode = None
+    self._pendingProgress = None
+    self._lastFlush = 0.0
+    self._flushTimer = None
+
+  def _log(self, *objects, sep=' ', end='\n'):
+    message = sep.join(map(str, objects)) + end
+    # The workers log concurrently, the lock keeps their lines apart.
+    with self._emitLock:
+      print('] installer:', message, end='')
+      self._pendingLog.append(message)
+    self._flush(force=False)
+
+  def _updateProgress(self, mode, progress):
+    if mode is not None and mode != self._mode:
+      self._slowdown()
+    with self._emitLock:
+      if mode == self._mode:
+        mode = None
+      if mode is not None:
+        self._mode = mode
+        self._pendingMode = mode
+      self._pendingProgress = progress
+    self._flush(force=mode is not None)
+
+  def _slowdown(self):
+    # Called before the mode changes. Waits until the current mode was
+    # displayed for at least the slowdown time, independent of how many
+    # progress updates there were.
+    now = time.monotonic()
+    if self._slowdownProgress and self._modeStarted is not None:
+      remaining = self._modeStarted + self._slowdownProgress - now
+      if remaining > 0:
+        self._flush()
+        time.sleep(remaining)
+    self._modeStarted = time.monotonic()
+
+  def _flush(self, force=True):
+    """
+    Emits the pending log messages and progress. Unless *force* is True,
+    the messages are emitted by a timer if the last flush was less than
+    1/:attr:`updatesPerSecond` seconds ago, so they are not held back
+    until the next message arrives.
+    """
+
+    with self._emitLock:
+      now = time.monotonic()
+      remaining = self._lastFlush + 1.0 / self.updatesPerSecond - now
+      if not force and remaining > 0:
+        if self._flushTimer is None:
+          self._flushTimer = threading.Timer(remaining, self._trailingFlush)
+          self._flushTimer.daemon = True
+          self._flushTimer.start()
+        return
+      self._lastFlush = now
+      if self._pendingLog:
+        self.logUpdate.emit(''.join(self._pendingLog))
+        self._pendingLog = []
+      if self._pendingProgress is not None:
+        self.progressUpdate.emit(self._pendingMode, self._pendingProgress)
+        self._pendingMode = None
+        self._pendingProgress = None
+
+  def _trailingFlush(self):
+    with self._emitLock:
+      self._flushTimer = None
+    self._flush()
+
+  def _bytesDone(self, nbytes):
+    # Called from the worker threads for every chunk that has been copied
+    # or hashed in the current mode.
+    with self._lock:
+      self._doneBytes += nbytes
+      done, total = self._doneBytes, max(self._totalBytes, 1)
+      sampled = self._meter.update(done)
+      rate, eta = self._meter.rate, self._meter.eta(done, total)
+    self._updateProgress(self._mode, min(done / total, 1.0))
+    if sampled:
+      self.throughputUpdate.emit(done, total, rate, -1.0 if eta is None else eta)
+
+  def _fileCopied(self, from_, to, size, skipped):
+    # Called from the CopyEngine worker threads.
+    hash = self._manifest.hash(from_) if self._manifest else None
+    if hash:
+      with self._lock:
+        self._targetHashes[to] = hash
+    if skipped:
+      self._log('Unchanged file:', to)
+    else:
+      self._log('Installed file:', to)
+      if self._verify:
+        with self._lock:
+          self._verifyFiles.append((from_, self._stagedPath(to), size))
+      journal = self._journalOf(to)
+      if journal:
+        st = os.stat(self._stagedPath(to))
+        with self._lock:
+          self._journalDirs()
+          journal.addFile(to, st.st_size, st.st_mtime, hash)
+
+  def _resumeFile(self, from_, to, size):
+    # Called from the CopyEngine worker threads. Returns True if *to* has
+    # been copied completely by an interrupted installation.
+    journal = self._journalOf(to)
+    if to not in journal.files:
+      return False
+    hash = self._manifest.hash(from_) if self._manifest else None
+    algorithm = None
+    if self._resume == 'hash':
+      algorithm = self._manifest.algorithm if hash else HASH_ALGORITHM
+      expected = hash or self._sourceHash(from_)
+    else:
+      expected = None
+    if not journal.isComplete(to, self._stagedPath(to), size, expected, algorithm):
+      return False
+    self._log('Resumed file:', to)
+    with self._lock:
+      if hash:
+        self._targetHashes[to] = hash
+      if self._verify and self._resume != 'hash':
+        self._verifyFiles.append((from_, self._stagedPath(to), size))
+    return True
+
+  def _sourceHash(self, from_):
+    member = self._payload.member(from_) if self._payload else None
+    if member is not None:
+      with self._payload.open(member) as fp:
+        return stream_hash(fp)
+    return file_hash(from_)
+
+  def _journalDirs(self):
+    # Must be called with the lock held. Records the directories that
+    # have been created since the last call.
+    for path in self._createdDirs[self._journaledDirs:]:
+      journal = self._journalOf(path)
+      if journal:
+        journal.addDir(path)
+    self._journaledDirs = len(self._createdDirs)
+
+  def _journalOf(self, path):
+    # Returns the resume journal of the target that *path* belongs to.
+    return self._journals[self._owner(path)] if self._journals else None
+
+  def _owner(self, path):
+    # Returns the index of the target that *path* belongs to.
+    return self._owners.get(path, 0)
+
+  def _claim(self, path, index):
+    # Records that *path* and its parent directories belong to the target
+    # *index*, unless they have been claimed by another target before.
+    # The parents are claimed before the files are queued, thus before
+    # the copy engine creates them.
+    if len(self._targets) == 1 or not path:
+      return
+    while path not in self._owners:
+      self._owners[path] = index
+      parent = os.path.dirname(path)
+      if parent == path:
+        break
+      path = parent
+
+  def _stage(self, path):
+    # Returns the path in the staging directory of its target that a file
+    # to install to *path* is written to, or None.
+    for target in self._targets:
+      staged = target.staging.path(path) if target.staging else None
+      if staged:
+        return staged
+    return None
+
+  def _stagedPath(self, path):
+    # Returns the path that a file to install to *path* is written to.
+    return self._stage(path) or path
+
+  def _staged(self):
+    return any(target.staging for target in self._targets)
+
+  def _journaled(self):
+    # The resume journals are stored next to the uninstall data files.
+    return all(target.installedFilesListFn for target in self._targets)
+
+  def _pathRemoved(self, path, exc):
+    # Called from the remove_paths() worker threads during the undo.
+    with self._lock:
+      self._removed += 1
+      progress = 1.0 - self._removed / self._removeCount
+    if exc is not None:
+      self._log('Error: Could not remove: {}'.format(path))
+    else:
+      self._log('Removed: {}'.format(path))
+    self._updateProgress(self.Mode.Undo, progress)
+
+  def _iterFiles(self, index):
+    # Returns the ``(source, target, size)`` items of the files of the
+    # copyfiles pair *index*. With more than one target, the target of
+    # every item is a tuple with the path in each target.
+    from_, to = self._targets[0].copyfiles[index]
+    files = self._payload.iter_files(from_, to) if self._payload else None
+    if files is None and self._manifest:
+      files = self._manifest.iter_files(from_, to)
+    if files is None:
+      files = iter_files(from_, to)
+    if len(self._targets) > 1:
+      files = self._fanOut(files, [t.copyfiles[index][1] for t in self._targets])
+    return files
+
+  def _fanOut(self, files, roots):
+    """
+    Maps the items of the first target in *files* to the targets with
+    the target paths *roots* of the same copyfiles pair. Paths that are
+    the same in several targets are only written once.
+    """
+
+    for from_, to, size in files:
+      relpath = os.path.relpath(to, roots[0])
+      targets = [to]
+      self._claim(to, 0)
+      for index, root in enumerate(roots[1:], 1):
+        path = root if relpath == os.curdir else os.path.join(root, relpath)
+        if path not in targets:
+          self._claim(path, index)
+          targets.append(path)
+      yield (from_, tuple(targets), size)
+
+  @staticmethod
+  def _itemBytes(item):
+    # The number of bytes that are written for a file list item.
+    from_, to, size = item
+    return size if isinstance(to, str) else size * len(to)
+
+  def _collect(self):
+    """
+    Generates the list of all source and target files.
+    """
+
+    filelist = []
+    count = len(self._targets[0].copyfiles)
+    self._log('Collecting file list ...')
+    for i in range(count):
+      self.raiseCancelled()
+      self._updateProgress(self.Mode.Collect, i / count)
+      filelist += self._iterFiles(i)
+    self._updateProgress(self.Mode.Collect, 1.0)
+    return filelist
+
+  def _iterFilelist(self):
+    """
+    Generates the source and target files one by one while adding their
+    size to the number of bytes to copy. Used in pipeline mode.
+    """
+
+    for i in range(len(self._targets[0].copyfiles)):
+      for item in self._iterFiles(i):
+        with self._lock:
+          self._totalBytes += self._itemBytes(item)
+        yield item
+
+  def _dependencyRunner(self, dependencies, progress=None, satisfied=()):
+    runner = DependencyRunner(dependencies, self._workers, self._log,
+        self.cancelled, progress, self._dependencyCache, satisfied)
+    self._dependencyRunners.append(runner)
+    return runner
+
+  def _installDependencies(self):
+    """
+    Installs the dependencies that must be installed before the files
+    are copied.
+    """
+
+    if not self._dependencies:
+      return
+    self._log('Installing dependencies ...')
+    self._updateProgress(self.Mode.Dependencies, 0.0)
+    runner = self._dependencyRunner(self._dependencies,
+        lambda done, total: self._updateProgress(self.Mode.Dependencies, done / total))
+    success = runner.run()
+    self.raiseCancelled()
+    if not success:
+      raise InstallAborted
+
+  def _startOverlapDependencies(self):
+    """
+    Starts installing the dependencies that may run while the files are
+    copied in the background.
+    """
+
+    if self._overlapDependencies:
+      self._log('Installing {} dependencies while copying files ...'
+          .format(len(self._overlapDependencies)))
+      # The dependencies that were installed before copying succeeded,
+      # the overlapping ones may have to run after them.
+      satisfied = [dep.ident for dep in self._dependencies]
+      self._dependencyRunner(self._overlapDependencies, satisfied=satisfied).start()
+
+  def _joinOverlapDependencies(self):
+    """
+    Waits for the dependencies that were started by
+    :meth:`_startOverlapDependencies`.
+    """
+
+    for runner in self._dependencyRunners:
+      if runner.started() and not runner.join():
+        self.raiseCancelled()
+        raise InstallAborted
+
+  def _copy(self, engine, filelist):
+    """
+    Copies the source files to their target location. *filelist* may be
+    a list or, in pipeline mode, an iterator. The workers may finish in
+    any order, so we only count the files that are done.
+    """
+
+    self._meter.reset()
+    engine.start()
+    try:
+      for item in filelist:
+        self.raiseCancelled()
+        engine.put(*item)
+      engine.join()
+    finally:
+      engine.shutdown()
+    self._updateProgress(self.Mode.Copy, 1.0)
+    self.raiseCancelled()
+
+  def _verifyCopies(self):
+    """
+    Hashes the copied files and compares them with their source. Raises
+    :class:`InstallAborted` if any file does not match.
+    """
+
+    files = self._verifyFiles
+    self._log('Verifying {} files ...'.format(len(files)))
+    with self._lock:
+      self._doneBytes = 0
+      self._totalBytes = 0
+      for from_, to, size in files:
+        hashed = self._manifest.hash(from_) if self._manifest else None
+        self._totalBytes += size if hashed else 2 * size
+    self._updateProgress(self.Mode.Verify, 0.0)
+    self._meter.reset()
+    start = time.monotonic()
+    mismatches = verify_files(files, self._workers, self.cancelled,
+        self._bytesDone, self._manifest, self._payload)
+    self.raiseCancelled()
+    self._log('Verified {} files ({:.1f} MB) in {:.1f}s'.format(len(files),
+        self._totalBytes / (1024.0 * 1024.0), time.monotonic() - start))
+    if mismatches:
+      for filename in mismatches:
+        self._log('Error: Verification failed:', filename)
+      raise InstallAborted
+    self._updateProgress(self.Mode.Verify, 1.0)
+
+  def _writeUninstallData(self):
+    """
+    Writes the uninstall data file of every target with the size,
+    modification time and, if available from the manifest, the hash of
+    every file so that the uninstaller can detect files that were modified
+    by the user.
+    """
+
+    files = [[] for target in self._targets]
+    dirs = [[] for target in self._targets]
+    # Skipped files are not staged, they already exist in the target.
+    for path in self._installedFiles:
+      files[self._owner(path)].append((path, self._stagedPath(path)))
+    for path in self._skippedFiles:
+      files[self._owner(path)].append((path, path))
+    for path in self._createdDirs[::-1]:
+      dirs[self._owner(path)].append(path)
+
+    algorithm = self._manifest.algorithm if self._manifest else None
+    count = max(1, sum(map(len, files)))
+    done = 0
+    for target, targetFiles, targetDirs in zip(self._targets, files, dirs):
+      filename = target.installedFilesListFn
+      if not filename:
+        continue
+      self._log("Writing install information to:", filename)
+      self._installedFiles.append(filename)
+      entries = []
+      for path, current in targetFiles:
+        self.raiseCancelled()
+        self._updateProgress(self.Mode.FileList, done / count)
+        done += 1
+        st = os.stat(current)
+        entries.append(Entry(path, False, st.st_size, st.st_mtime, self._targetHashes.get(path)))
+      entries.append(Entry(filename))
+      entries += [Entry(path, True) for path in targetDirs]
+      filename = self._stagedPath(filename)
+      if target.staging:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+      write_uninstall_data(filename, entries, algorithm)
+    self._updateProgress(self.Mode.FileList, 1.0)
+
+  def _recover(self, staging):
+    """
+    Rolls back or completes an installation into the same target that
+    was interrupted, then creates a new staging directory.
+    """
+
+    keep = bool(self._journals)
+    state = staging.recover(keep)
+    if state == Staging.Commit:
+      self._log('Completed an interrupted installation in:', staging.root)
+    elif state is not None and not (keep and state == Staging.Staging):
+      self._log('Rolled back an interrupted installation in:', staging.root)
+    staging.begin()
+
+  def _beginJournal(self, engine, index):
+    """
+    Loads the journal of an interrupted installation of the same files
+    into the target *index*, if any, and opens it for recording the files
+    of this installation. The directories that were created by the
+    interrupted installation are added to the created directories.
+    """
+
+    journal = self._journals[index]
+    staging = self._targets[index].staging
+    resumed = journal.load()
+    if resumed:
+      self._log('Resuming an interrupted installation, {} files were already copied'
+          .format(len(journal.files)))
+      dirs = [x for x in journal.dirs if os.path.isdir(x)]
+      for path in dirs:
+        self._claim(path, index)
+      engine.createdDirs.extend(dirs)
+    elif staging and os.listdir(staging.files):
+      # The kept files were staged for a different installation.
+      self._log('Rolled back an interrupted installation in:', staging.root)
+      staging.rollback()
+      staging.begin()
+    self._journaledDirs = len(engine.createdDirs)
+    self._claim(journal.filename, index)
+    engine.makedirs(os.path.dirname(journal.filename), record=not staging)
+    journal.begin(resumed)
+    with self._lock:
+      self._journalDirs()
+
+  def _commit(self):
+    """
+    Moves the staged files to their target location. Once the commit has
+    started, the installation can no longer be cancelled.
+    """
+
+    stagings = [target.staging for target in self._targets if target.staging]
+    self._updateProgress(self.Mode.Commit, 0.0)
+    start = time.monotonic()
+    self._committing = True
+    for i, staging in enumerate(stagings):
+      self._log('Moving staged files to:', staging.root)
+      staging.commit()
+      self._updateProgress(self.Mode.Commit, (i + 1) / len(stagings))
+    self._log('Committed the installation in {:.2f}s'.format(time.monotonic() - start))
+    self._updateProgress(self.Mode.Commit, 1.0)
+
+  def _run_internal(self):
+    Mode = self.Mode
+    engine = CopyEngine(self._workers, self.cancelled, self._fileCopied, self._log,
+        maxsize=self._workers * 16 if self._pipeline else 0,
+        progress=self._bytesDone, incremental=self._incremental,
+        manifest=self._manifest, backend=self._backend, payload=self._payload,
+        stage=self._stage if self._staged() else None,
+        resume=self._resumeFile if self._resume and self._journaled() else None)
+    installedFiles = self._installedFiles = engine.installedFiles
+    self._skippedFiles = engine.skippedFiles
+    createdDirs = self._createdDirs = engine.createdDirs
+
+    try:
+      for index, target in enumerate(self._targets):
+        self._claim(target.installedFilesListFn, index)
+      if self._resume and self._journaled():
+        for target in self._targets:
+          filename = self._stagedPath(target.installedFilesListFn + '.journal')
+          self._journals.append(ResumeJournal(filename, target.copyfiles))
+      for target in self._targets:
+        if target.staging:
+          self._recover(target.staging)
+      for index in range(len(self._journals)):
+        self._beginJournal(engine, index)
+
+      if self._pipeline:
+        # Collect the files while the workers are already copying. The
+        # queue of the engine is bounded, so the memory consumption does
+        # not grow with the number of files.
+        self._installDependencies()
+        self._startOverlapDependencies()
+        self._log('Collecting and copying files ...')
+        self._updateProgress(Mode.Copy, 0.0)
+        self._copy(engine, self._iterFilelist())
+      else:
+        filelist = self._collect()
+        self._installDependencies()
+        self._startOverlapDependencies()
+        self._log('Copying {} files ...'.format(len(filelist)))
+        self._updateProgress(Mode.Copy, 0.0)
+        self._totalBytes = sum(map(self._itemBytes, filelist))
+        self._copy(engine, filelist)
+
+      if self._verify:
+        self._verifyCopies()
+      self._joinOverlapDependencies()
+
+      # Create a file that lists up every file we created.
+      self._writeUninstallData()
+      for journal in self._journals:
+        journal.remove()
+
+      self.raiseCancelled()
+      if self._staged():
+        self._commit()
+      self._log('Installation successful!')
+    except Exception as exc:
+      traceback.print_exc()
+      self._running = False
+
+      if isinstance(exc, InstallCancelled):
+        self._log("User cancelled installation.")
+      elif isinstance(exc, InstallAborted):
+        # Controlled abortion
+        pass
+      elif isinstance(exc, FileNotFoundError):
+        self._log('Error: file could not be found:', exc)
+      else:
+        self._log('Error:', exc)
+
+      # Dependency installers that are still running in the background
+      # are not killed, they could leave the system in a broken state.
+      for runner in self._dependencyRunners:
+        if runner.started():
+          runner.join()
+
+      # The files of this installation are removed, so there is nothing
+      # to resume.
+      for journal in self._journals:
+        journal.remove()
+
+      # Try to undo all installed files and created directories. The
+      # directories are removed deepest first. Skipped files existed
+      # before the installation and are kept.
+      pathsToRemove = installedFiles + createdDirs[::-1]
+      if self._staged() and not self._committing:
+        # Nothing has been moved to the target yet, only the files that
+        # could not be staged have to be removed.
+        pathsToRemove = [p for p in pathsToRemove if self._stage(p) is None]
+      if pathsToRemove:
+        self._log('Removing already installed files ...')
+      self._removed = 0
+      self._removeCount = len(pathsToRemove)
+      self._updateProgress(Mode.Undo, 1.0)
+      remove_paths(pathsToRemove, self._workers, self._pathRemoved)
+      for target in self._targets:
+        if not target.staging:
+          continue
+        try:
+          target.staging.rollback()
+        except OSError as exc:
+          self._log('Error: Could not remove the staging directory:', exc)
+
+      self._updateProgress(Mode.Cancelled if self.cancelled() else Mode.Error, 0.0)
+    else:
+      self._updateProgress(Mode.Complete, 1.0)
+    print("note: Installer thread ended")
+
+  def _run(self):
+    try:
+      self._run_internal()
+    except:
+      try:
+        self._log(traceback.format_exc())
+        self._updateProgress(self.Mode.Error, 1.0)
+      except:
+        traceback.print_exc()
+    finally:
+      if self._payload:
+        self._payload.close()
+
+  def mode(self):
+    with self._lock:
+      return self._mode
+
+  def cancel(self):
+    with self._lock:
+      self._cancelled = True
+      self._running = False
+
+  def cancelled(self):
+    with self._lock:
+      return self._cancelled
+
+  def raiseCancelled(self):
+    if self.cancelled():
+      raise InstallCancelled()
+
+  def running(self):
+    with self._lock:
+      return self._running
+
+  def start(self):
+    with self._lock:
+      if self._running:
+        raise RuntimeError("already running")
+    if self._thread:
+      raise RuntimeError("can not be restarted")
+    self._running = True
+    self._thread = threading.Thread(target=self._run)
+    self._thread.start()
+    print("note: Installer thread started")
+
+  def wait(self, timeout=None):
+    """
+    Waits until the installation is finished or *timeout* seconds passed.
+    Returns True if the installation is finished.
+    """
+
+    if self._thread:
+      self._thread.join(timeout)
+      return not self._thread.is_alive()
+    return True
+
+  def installedFiles(self):
+    " Only access while installer is NOT running. "
+    return self._installedFiles
+
+  def dependencyResults(self):
+    """
+    Returns a dictionary that maps the identifiers of the dependencies that
+    have been run to a :class:`dependencies.DependencyResult`. Only access
+    while installer is NOT running.
+    """
+
+    results = collections.OrderedDict()
+    for runner in self._dependencyRunners:
+      results.update(runner.results)
+    return results
+
+
+class UninstallEngine(object):
+  """
+  Removes the files and directories listed in the uninstall *dataFile*
+  using *workers* threads in a background thread. The file is read and
+  closed before anything is removed, as it lists itself. Files that have
+  been modified since they were installed are kept.
+
+  Signals:
+
+  .. signal:: progressUpdate(progress, done)
+
+    Emitted when the progress changed by at least one percent, and once
+    with *done* set to True when the uninstallation is finished.
+  """
+
+  def __init__(self, dataFile, workers=1):
+    self.progressUpdate = Signal()
+    self._dataFile = dataFile
+    self._workers = workers
+    self._removed = 0
+    self._removeCount = 0
+    self._percent = 0
+    self._thread = None
+    self._running = False
+    self._lock = threading.Lock()
+    self._error = None
+
+  def running(self):
+    with self._lock:
+      return self._running
+
+  def start(self):
+    with self._lock:
+      if self._running:
+        raise RuntimeError("already running")
+      if self._thread:
+        raise RuntimeError("can not be restarted")
+      self._thread = threading.Thread(target=self._run)
+      self._thread.start()
+
+  def wait(self, timeout=None):
+    """
+    Waits until the uninstallation is finished or *timeout* seconds
+    passed. Returns True if it is finished.
+    """
+
+    if self._thread:
+      self._thread.join(timeout)
+      return not self._thread.is_alive()
+    return True
+
+  def _runInternal(self):
+    if not self._dataFile:
+      # Fake the uninstallation process
+      for i in range(10):
+        self.progressUpdate.emit(i / 10, False)
+        time.sleep(0.5)
+    else:
+      # The data file and its directory are listed in the file, it can
+      # not be removed while it is open (on Windows).
+      with UninstallDataReader(self._dataFile) as reader:
+        entries = list(reader)
+        algorithm = reader.algorithm
+      self._removeCount = len(entries)
+      self.progressUpdate.emit(0.0, False)
+      remove_paths(self._iterPaths(entries, algorithm), self._workers, self._pathRemoved)
+
+  def _iterPaths(self, entries, algorithm):
+    for entry in entries:
+      if is_modified(entry, algorithm):
+        print('Note: Keeping modified file:', entry.path)
+        self._pathRemoved(entry.path, None)
+      else:
+        yield entry.path
+
+  def _pathRemoved(self, path, exc):
+    # Called from the remove_paths() worker threads.
+    with self._lock:
+      if exc is not None:
+        print('Error: Could not remove:', exc)
+      self._removed += 1
+      percent = int(100 * self._removed / self._removeCount)
+      if percent == self._percent:
+        return
+      self._percent = percent
+    self.progressUpdate.emit(percent / 100, False)
+
+  def _run(self):
+    try:
+      self._runInternal()
+    except BaseException as exc:
+      traceback.print_exc()
+      with self._lock:
+        self._error = exc
+        self._running = False
+    finally:
+      self.progressUpdate.emit(1.0, True)
+
+
+def get_filelist(from_, to):
+  """
+  Given two paths *from_* and *to*, returns a generator that yields absolute
+  source and target filenames. If *from_* is a directory, *to* will also be
+  assumed to be a directory. See :func:`copyengine.iter_files` to also
+  get the size of each file.
+
+  :raise FileNotFoundError: If *from_* or *to* are not absolute paths.
+
+  .. todo:: Support glob patterns
+  """
+
+  for from_, to, size in iter_files(from_, to):
+    yield (from_, to)
+
+
+def remove_path(path):
+  """
+  Removes a file or directory. Raises an error if its a directory that is
+  not empty.
+  """
+
+  if os.path.isdir(path) and not os.listdir(path):
+    os.rmdir(path)
+  else:
+    os.remove(path)
+
@@ -14,23 +14,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from . import PLATFORM, APP_SUFFIX
 from .base import FormPage, BaseInstaller
-from .installthread import InstallThread, InstallDependency
-from .utils import c4dfinder
+from .installplan import install_options
+from .installthread import FinderThread, InstallThread
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 
 import io
 import os
-import string
 
 
 class AboutPage(FormPage('page00about')):
 
   def initForm(self):
-    self.label.setText(self.ls('about.label'))
+    self.setLocalizedText(self.label.setText, 'about.label')
     self.textView.setWordWrapMode(QTextOption.NoWrap)
     self.buttonBack.clicked.connect(lambda: self.installer.setCurrentPage())
     self.becomesVisible.connect(self.on_becomesVisible)
@@ -48,7 +46,7 @@ class AboutPage(FormPage('page00about')):
 class WelcomePage(FormPage('page01welcome')):
 
   def initForm(self):
-    self.label.setText(self.ls('welcome.label'))
+    self.setLocalizedText(self.label.setText, 'welcome.label')
     self.initButtonBox('eulaPage')
     self.buttonAbout.clicked.connect(lambda: self.installer.setCurrentPage(self.installer.aboutPage, False))
 
@@ -56,7 +54,7 @@ class WelcomePage(FormPage('page01welcome')):
 class EulaPage(FormPage('page02eula')):
 
   def initForm(self):
-    self.label.setText(self.ls('eula.label'))
+    self.setLocalizedText(self.label.setText, 'eula.label')
     self.initButtonBox('featuresPage')
     self.radioButtonGroup.buttonClicked.connect(self.on_radioButtonClicked)
     self.becomesVisible.connect(self.on_becomesVisible)
@@ -89,7 +87,7 @@ class FeaturesPage(FormPage('page03features')):
       return self._ident
 
   def initForm(self):
-    self.label.setText(self.ls('features.label'))
+    self.setLocalizedText(self.label.setText, 'features.label')
     self.initButtonBox('targetPage')
     for ident, name in self.config('features').items():
       is_main_feature = ident.startswith('!')
@@ -100,7 +98,8 @@ class FeaturesPage(FormPage('page03features')):
       if not is_main_feature:
         flags |= Qt.ItemIsEnabled
 
-      item = self.Feature(ident, self.ls(subst=name))
+      item = self.Feature(ident, name)
+      self.setLocalizedText(item.setText, subst=name)
       item.setFlags(flags)
       item.setCheckState(Qt.Checked)
       self.listWidget.addItem(item)
@@ -119,39 +118,84 @@ class FeaturesPage(FormPage('page03features')):
 class TargetPage(FormPage('page04target')):
 
   class C4DInstallation(QListWidgetItem):
-    def __init__(self, name, path, parent=None):
-      super().__init__(name, parent)
-      self._path = path
+    def __init__(self, installation, parent=None):
+      super().__init__(installation.name, parent)
+      self._installation = installation
+      self.setToolTip(installation.path)
     def installPath(self):
-      return self._path
+      return self._installation.path
+    def installation(self):
+      return self._installation
 
   def initForm(self):
-    self.label.setText(self.ls('target.label'))
-    self.labelPath.setText(self.ls('target.path'))
+    self.setLocalizedText(self.label.setText, 'target.label')
+    self.setLocalizedText(self.labelPath.setText, 'target.path')
     self.initButtonBox('installPage')
-    for name, path in c4dfinder.find_installations():
-      item = self.C4DInstallation(name, path)
-      self.listWidget.addItem(item)
-      if not self.listWidget.currentItem():
-        self.listWidget.setCurrentItem(item)
+    # Several installations can be selected to install into all of them.
+    self.listWidget.setSelectionMode(QAbstractItemView.MultiSelection)
+    # The installations are added as they are found, the search must not
+    # delay showing the installer window.
+    self.finderThread = FinderThread(self.config('target.search_roots', []),
+        self.config('target.search_depth', 1))
+    self.finderThread.installationFound.connect(self.on_installationFound, Qt.QueuedConnection)
+    self.finderThread.start()
+    self.manualPath = False
     self.listWidget.itemClicked.connect(self.on_itemClicked)
+    self.listWidget.itemSelectionChanged.connect(self.on_selectionChanged)
+    self.listWidget.itemSelectionChanged.connect(self.on_targetPathChanged)
     self.buttonChoosePath.clicked.connect(self.on_choosePath)
     self.targetPath.textChanged.connect(self.on_targetPathChanged)
+    self.targetPath.textEdited.connect(self.on_targetPathEdited)
     self.on_itemClicked()
 
+  def on_installationFound(self, installation):
+    item = self.C4DInstallation(installation)
+    self.listWidget.addItem(item)
+    # Preselect the first installation unless a path was already chosen.
+    if not self.listWidget.currentItem() and not self.targetPath.text():
+      self.listWidget.setCurrentItem(item)
+      item.setSelected(True)
+      self.on_itemClicked()
+
+  def targetPaths(self):
+    """
+    Returns the list of directories to install to. These are the selected
+    installations, or the path in the text field if none is selected.
+    """
+
+    items = sorted(self.listWidget.selectedItems(), key=self.listWidget.row)
+    paths = [item.installPath() for item in items]
+    if not paths and self.targetPath.text():
+      paths = [self.targetPath.text()]
+    return paths
+
   def on_targetPathChanged(self):
-    path = self.targetPath.text()
-    valid = os.path.isabs(path) and os.path.isdir(path)
+    paths = self.targetPaths()
+    valid = bool(paths) and all(os.path.isabs(x) and os.path.isdir(x) for x in paths)
     self.buttonOk.setEnabled(valid)
 
+  def on_targetPathEdited(self):
+    # A path that is entered manually replaces the selected installations.
+    self.manualPath = True
+    self.listWidget.clearSelection()
+
+  def on_selectionChanged(self):
+    # The text field shows a selected installation. After the last one is
+    # deselected, there is nothing to install into.
+    if not self.manualPath and not self.listWidget.selectedItems():
+      self.targetPath.clear()
+
   def on_itemClicked(self):
     item = self.listWidget.currentItem()
-    if item:
+    if item and item.isSelected():
+      self.manualPath = False
       self.targetPath.setText(item.installPath())
 
   def on_choosePath(self):
     path = QFileDialog.getExistingDirectory(self, directory=self.targetPath.text())
     if path:
+      self.manualPath = True
+      self.listWidget.clearSelection()
       self.targetPath.setText(path)
 
 
@@ -185,82 +229,66 @@ class InstallPage(FormPage('page05install')):
     self.textView.setVisible(not self.textView.isVisible())
 
   def on_becomesVisible(self):
-    targetPath = self.installer.targetPage.targetPath.text()
-    if not targetPath or not os.path.isdir(targetPath) or not os.path.isabs(targetPath):
-      QMessageBox.critical(None, 'Error', 'The target directory "{}" does not exist'.format(targetPath))
-      self.installer.cancel()
-      return
-
-    # Expand variables in the copyfiles list.
-    vars = {'c4d': targetPath, 'src': os.path.abspath('data/install'),
-            'systemappdir': 'C:\\Program Files' if PLATFORM == 'windows' else '/Applications'}
-    def render(x): return string.Template(x).substitute(**vars)
-
-    copyfiles = []
-    haveFeatures = set()
-    for feature in self.installer.featuresPage.iterFeatures():
-      if feature.checkState() == Qt.Checked:
-        haveFeatures.add(feature.ident())
-        copyfiles += self.installer.config('install.copyfiles.' + feature.ident(), {}).items()
-    copyfiles = [(render(s), render(d)) for (s, d) in copyfiles]
-
-    dependencies = []
-    for dep in self.config('install.dependencies'):
-      name = self.ls(subst=dep['name'])
-      if dep['platform'] != PLATFORM:
-        print('note: skipping dependency:', name, '(platform is not', dep['platform'], ')')
-        continue
-      features = set(dep.get('features', []))
-      if features and not (features & haveFeatures):
-        print('note: skipping dependency:', name, '(none of', features, 'will be installed)')
-        continue
-
-      cmd = list(map(render, [dep['file']] + dep.get('args', [])))
-      ret = dep.get('returncodes', [0])
-      dep = InstallDependency(name, cmd, ret)
-      dependencies.append(dep)
-
-    if self.config('uninstaller.enabled'):
-      targetDir = render(self.config('uninstaller.target_directory') or '')
-      uninstallerName = self.config('uninstaller.name') + APP_SUFFIX
-      sourceFile = os.path.abspath(os.path.join('data/uninstaller/', uninstallerName))
-      destFile = os.path.abspath(os.path.join(targetDir, uninstallerName))
-      copyfiles.append((sourceFile, destFile))  # TODO: Uninstaller is a directory on OSX?
-      installedFilesListFn = os.path.join(targetDir, uninstallerName + '.data')
-    else:
-      installedFileListFn = None
-
-    slowdownProgress = self.config('install.slowdown')
+    targetPaths = self.installer.targetPage.targetPaths()
+    for targetPath in targetPaths or ['']:
+      if not targetPath or not os.path.isdir(targetPath) or not os.path.isabs(targetPath):
+        QMessageBox.critical(None, 'Error', 'The target directory "{}" does not exist'.format(targetPath))
+        self.installer.cancel()
+        return
+
+    features = [x.ident() for x in self.installer.featuresPage.iterFeatures()
+                if x.checkState() == Qt.Checked]
+    options = install_options(self.installer._config, self.installer._strings,
+        targetPaths, features)
     self.installLog = io.StringIO()
-    self.installThread = InstallThread(copyfiles, dependencies, installedFilesListFn, slowdownProgress)
+    self.installThread = InstallThread(**options)
     self.installThread.logUpdate.connect(self.on_logUpdate, Qt.QueuedConnection)
     self.installThread.progressUpdate.connect(self.on_progressUpdate, Qt.QueuedConnection)
+    self.installThread.throughputUpdate.connect(self.on_throughputUpdate, Qt.QueuedConnection)
     self.installThread.start()
 
   def on_logUpdate(self, text):
+    # The text is appended instead of setting the whole log again, which
+    # would get slower with every line that is added.
     self.installLog.write(text)
-    self.textView.setPlainText(self.installLog.getvalue())
+    self.textView.appendPlainText(text.rstrip('\n'))
+
+  def on_throughputUpdate(self, bytesDone, bytesTotal, rate, eta):
+    MB = 1024.0 * 1024.0
+    if eta < 0:
+      eta = '--:--'
+    else:
+      eta = '{:d}:{:02d}'.format(*divmod(int(eta), 60))
+    self.labelThroughput.setText(self.ls('install.throughput').format(
+        done='{:.1f}'.format(bytesDone / MB), total='{:.1f}'.format(bytesTotal / MB),
+        rate='{:.1f}'.format(rate / MB), eta=eta))
 
   def on_progressUpdate(self, mode, progress):
     Mode = InstallThread.Mode
     if mode == Mode.Collect:
-      self.label.setText(self.ls('install.collect'))
+      self.setLocalizedText(self.label.setText, 'install.collect')
     elif mode == Mode.Dependencies:
-      self.label.setText(self.ls('install.dependencies'))
+      self.setLocalizedText(self.label.setText, 'install.dependencies')
     elif mode == Mode.Copy:
-      self.label.setText(self.ls('install.copy'))
+      self.setLocalizedText(self.label.setText, 'install.copy')
+    elif mode == Mode.Verify:
+      self.setLocalizedText(self.label.setText, 'install.verify')
     elif mode == Mode.FileList:
-      self.label.setText(self.ls('install.filelist'))
+      self.setLocalizedText(self.label.setText, 'install.filelist')
+    elif mode == Mode.Commit:
+      self.setLocalizedText(self.label.setText, 'install.commit')
     elif mode == Mode.Undo:
-      self.label.setText(self.ls('install.undo'))
+      self.setLocalizedText(self.label.setText, 'install.undo')
     elif mode == Mode.Complete:
-      self.label.setText(self.ls('install.complete'))
+      self.setLocalizedText(self.label.setText, 'install.complete')
     elif mode == Mode.Cancelled:
-      self.label.setText(self.ls('install.cancelled'))
+      self.setLocalizedText(self.label.setText, 'install.cancelled')
     elif mode == Mode.Error:
-      self.label.setText(self.ls('install.error'))
+      self.setLocalizedText(self.label.setText, 'install.error')
       self.textView.setVisible(True)
 
+    if mode is not None and mode not in (Mode.Copy, Mode.Verify):
+      self.labelThroughput.clear()
     if mode in (Mode.Complete, Mode.Cancelled, Mode.Error):
       self.buttonOk.setEnabled(True)
       self.buttonCancel.setEnabled(False)
@@ -274,43 +302,39 @@ class EndPage(FormPage('page06end')):
     self.becomesVisible.connect(self.on_becomesVisible)
 
   def on_becomesVisible(self):
-    installThread = self.installer.installPage.installThread
+    installThread = None
+    if self.installer.pageLoaded('installPage'):
+      installThread = self.installer.installPage.installThread
     if not installThread or installThread.mode == InstallThread.Mode.Cancelled:
-      text = self.ls('end.canceled')
+      name = 'end.canceled'
     elif installThread.mode() == InstallThread.Mode.Error:
-      text = self.ls('end.failure')
+      name = 'end.failure'
     else:
-      text = self.ls('end.success')
-    self.label.setText(text)
+      name = 'end.success'
+    self.setLocalizedText(self.label.setText, name)
 
 
 
 class Installer(BaseInstaller):
 
   def initForm(self):
-    self.aboutPage = AboutPage(self)
-    self.welcomePage = WelcomePage(self)
-    self.eulaPage = EulaPage(self)
-    self.featuresPage = FeaturesPage(self)
-    self.targetPage = TargetPage(self)
-    self.installPage = InstallPage(self)
-    self.endPage = EndPage(self)
-
-    self.stackedPages.addWidget(self.aboutPage)
-    self.stackedPages.addWidget(self.welcomePage)
-    self.stackedPages.addWidget(self.eulaPage)
-    self.stackedPages.addWidget(self.featuresPage)
-    self.stackedPages.addWidget(self.targetPage)
-    self.stackedPages.addWidget(self.installPage)
-    self.stackedPages.addWidget(self.endPage)
-
-    self.setWindowTitle(self.ls('installer.title'))
+    # The welcome page is constructed first, the others when they are
+    # needed or while the window is idle.
+    self.addPage('welcomePage', WelcomePage)
+    self.addPage('eulaPage', EulaPage)
+    self.addPage('featuresPage', FeaturesPage)
+    self.addPage('targetPage', TargetPage)
+    self.addPage('installPage', InstallPage)
+    self.addPage('endPage', EndPage)
+    self.addPage('aboutPage', AboutPage)
+
+    self.setLocalizedText(self.setWindowTitle, 'installer.title')
     self.setCurrentPage(self.welcomePage)
     super().initForm()
 
   def cancel(self):
     print("info: called Installer.cancel()")
-    if not self.installPage.askCancel():
+    if self.pageLoaded('installPage') and not self.installPage.askCancel():
       print("info: InstallPage says we need to wait a bit")
       return
     self.setCurrentPage(self.endPage)
@@ -318,7 +342,8 @@ class Installer(BaseInstaller):
   # QWidget
 
   def closeEvent(self, event):
-    if self.currentPage == self.installPage and not self.installPage.askCancel():
+    if self.pageLoaded('installPage') and self.currentPage == self.installPage \
+        and not self.installPage.askCancel():
       event.ignore()
     else:
       event.accept()
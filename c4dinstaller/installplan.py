@@ -0,0 +1,183 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Turns the ``"install"`` section of the configuration into the arguments
+of an :class:`installengine.InstallEngine`. Shared by the installer
+window and the headless installer.
+"""
+
+from . import PLATFORM, APP_SUFFIX, get_config, localize
+from .dependencies import DependencyCache, InstallDependency
+from .installengine import InstallTarget
+from .manifest import Manifest
+from .payload import Payload
+from .staging import Staging
+
+import collections
+import os
+import string
+import sys
+
+
+def system_app_dir():
+  if PLATFORM == 'windows':
+    return 'C:\\Program Files'
+  elif PLATFORM == 'osx':
+    return '/Applications'
+  return '/opt'
+
+
+def default_dependency_cache():
+  if PLATFORM == 'windows':
+    return os.path.join(os.getenv('PROGRAMDATA', 'C:\\ProgramData'),
+        'C4DInstaller', 'dependencies.json')
+  elif PLATFORM == 'osx':
+    return '/Library/Application Support/C4DInstaller/dependencies.json'
+  return '/var/lib/c4dinstaller/dependencies.json'
+
+
+def all_features(config):
+  """
+  Returns a list of ``(ident, name, required)`` tuples for the features
+  in *config*.
+  """
+
+  result = []
+  for ident, name in get_config(config, 'features', {}).items():
+    required = ident.startswith('!')
+    result.append((ident[1:] if required else ident, name, required))
+  return result
+
+
+def _renderer(targetPath):
+  # Returns a function that expands the variables in a string of the
+  # "install" configuration for the Cinema 4D directory *targetPath*.
+  vars = {'c4d': targetPath, 'src': os.path.abspath('data/install'),
+          'systemappdir': system_app_dir()}
+  def render(x): return string.Template(x).substitute(**vars)
+  return render
+
+
+def install_target(config, targetPath, features):
+  """
+  Returns an :class:`installengine.InstallTarget` that installs the
+  *features* into the Cinema 4D directory *targetPath*.
+  """
+
+  def cfg(name, default=NotImplemented):
+    return get_config(config, name, default)
+
+  render = _renderer(targetPath)
+  copyfiles = []
+  for feature in features:
+    copyfiles += cfg('install.copyfiles.' + feature, {}).items()
+  copyfiles = [(render(s), render(d)) for (s, d) in copyfiles]
+
+  installedFilesListFn = None
+  if cfg('uninstaller.enabled'):
+    targetDir = render(cfg('uninstaller.target_directory') or '')
+    uninstallerName = cfg('uninstaller.name') + APP_SUFFIX
+    sourceFile = os.path.abspath(os.path.join('data/uninstaller/', uninstallerName))
+    destFile = os.path.abspath(os.path.join(targetDir, uninstallerName))
+    copyfiles.append((sourceFile, destFile))  # TODO: Uninstaller is a directory on OSX?
+    installedFilesListFn = os.path.join(targetDir, uninstallerName + '.data')
+
+  staging = None
+  if cfg('install.staged', False):
+    staging = Staging(os.path.join(targetPath, '.c4dinstaller-staging'), targetPath)
+  return InstallTarget(copyfiles, installedFilesListFn, staging)
+
+
+def install_options(config, strings, targetPaths, features):
+  """
+  Returns an :class:`collections.OrderedDict` with the keyword arguments
+  for an :class:`installengine.InstallEngine` that installs the *features*
+  into the Cinema 4D directory *targetPaths*, or into every directory if
+  it is a list. The dependencies are rendered for the first directory.
+  """
+
+  def cfg(name, default=NotImplemented):
+    return get_config(config, name, default)
+
+  if isinstance(targetPaths, str):
+    targetPaths = [targetPaths]
+  targets = [install_target(config, path, features) for path in targetPaths]
+  render = _renderer(targetPaths[0])
+
+  dependencies = []
+  haveFeatures = set(features)
+  for dep in cfg('install.dependencies'):
+    name = localize(strings, subst=dep['name'])
+    if dep['platform'] != PLATFORM:
+      print('note: skipping dependency:', name, '(platform is not', dep['platform'], ')')
+      continue
+    features = set(dep.get('features', []))
+    if features and not (features & haveFeatures):
+      print('note: skipping dependency:', name, '(none of', features, 'will be installed)')
+      continue
+
+    cmd = list(map(render, [dep['file']] + dep.get('args', [])))
+    ret = dep.get('returncodes', [0])
+    detect = dict(dep.get('detect', {}))
+    for key in ('file', 'version_file'):
+      if key in detect:
+        detect[key] = render(detect[key])
+    if 'command' in detect:
+      detect['command'] = list(map(render, detect['command']))
+    dep = InstallDependency(name, cmd, ret, dep.get('id'), dep.get('after', []),
+        dep.get('parallel', False), dep.get('timeout'), dep.get('overlap', False),
+        detect)
+    dependencies.append(dep)
+  # Dependencies that are skipped on this platform or for the selected
+  # features do not need to be waited for.
+  idents = set(dep.ident for dep in dependencies)
+  for dep in dependencies:
+    dep.after = [x for x in dep.after if x in idents]
+
+  # The manifest and the payload are only used by a built installer. When
+  # they are left over by a build, they would not match the files in a
+  # development tree.
+  frozen = getattr(sys, 'frozen', False)
+  manifest = None
+  if frozen and os.path.isfile('data/manifest.json'):
+    manifest = Manifest.load('data/manifest.json', 'data/install')
+  payload = None
+  if frozen and os.path.isfile('data/install.zip'):
+    payload = Payload('data/install.zip', 'data/install')
+  dependencyCache = None
+  cacheFile = cfg('install.dependency_cache', True)
+  if cacheFile is True:
+    cacheFile = default_dependency_cache()
+  if cacheFile and dependencies:
+    dependencyCache = DependencyCache(render(cacheFile))
+
+  options = collections.OrderedDict()
+  options['copyfiles'] = targets[0].copyfiles
+  options['dependencies'] = dependencies
+  options['installedFilesListFn'] = targets[0].installedFilesListFn
+  options['slowdownProgress'] = cfg('install.slowdown', None)
+  options['workers'] = cfg('install.workers', 1)
+  options['pipeline'] = cfg('install.pipeline', False)
+  options['incremental'] = cfg('install.incremental', False)
+  options['manifest'] = manifest
+  options['verify'] = cfg('install.verify', False)
+  options['backend'] = cfg('install.backend', 'auto')
+  options['payload'] = payload
+  options['staging'] = targets[0].staging
+  options['resume'] = cfg('install.resume', False)
+  options['dependencyCache'] = dependencyCache
+  options['targets'] = targets[1:]
+  return options
@@ -0,0 +1,137 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+The manifest lists every file in the ``data/install`` directory with its
+size and hash. It is generated when the installer is built (see
+``.scripts/make-manifest.py``) so that the installer does not need to walk
+or hash the source files on the user's machine.
+"""
+
+from .copyengine import HASH_ALGORITHM, file_hash, iter_files
+
+import collections
+import hashlib
+import itertools
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+
+class Manifest(object):
+  """
+  Maps the paths of the files in the *root* directory to their size and
+  hash. Paths are stored relative to *root* with forward slashes.
+  """
+
+  def __init__(self, root, algorithm=HASH_ALGORITHM, files=None):
+    self.root = os.path.abspath(root)
+    self.algorithm = algorithm
+    self.files = files if files is not None else collections.OrderedDict()
+
+  def __len__(self):
+    return len(self.files)
+
+  @classmethod
+  def build(cls, root, algorithm=HASH_ALGORITHM):
+    manifest = cls(root, algorithm)
+    for path, _, size in iter_files(manifest.root, manifest.root):
+      relpath = os.path.relpath(path, manifest.root).replace(os.sep, '/')
+      manifest.files[relpath] = (size, file_hash(path, algorithm))
+    return manifest
+
+  @classmethod
+  def load(cls, filename, root):
+    """
+    Loads a manifest from *filename*. If the hash algorithm that was used
+    to create the manifest is not available, the hashes are discarded.
+    """
+
+    with open(filename) as fp:
+      data = json.load(fp)
+    if data.get('version') != MANIFEST_VERSION:
+      raise ValueError('unsupported manifest version: {!r}'.format(data.get('version')))
+    algorithm = data['algorithm']
+    try:
+      hashlib.new(algorithm)
+    except ValueError:
+      algorithm = None
+    files = collections.OrderedDict()
+    for relpath, size, hash in data['files']:
+      files[relpath] = (size, hash if algorithm else None)
+    return cls(root, algorithm, files)
+
+  def save(self, filename):
+    data = collections.OrderedDict()
+    data['version'] = MANIFEST_VERSION
+    data['algorithm'] = self.algorithm
+    data['files'] = [[k, size, hash] for k, (size, hash) in self.files.items()]
+    with open(filename, 'w') as fp:
+      json.dump(data, fp)
+
+  def relpath(self, path):
+    """
+    Returns *path* relative to the manifest root with forward slashes,
+    or None if *path* is not inside the root directory.
+    """
+
+    try:
+      relpath = os.path.relpath(os.path.abspath(path), self.root)
+    except ValueError:
+      # On Windows, if the path is on a different drive.
+      return None
+    if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+      return None
+    return relpath.replace(os.sep, '/')
+
+  def hash(self, path):
+    """
+    Returns the hash of the file *path* or None if it is not listed in
+    the manifest.
+    """
+
+    relpath = self.relpath(path)
+    entry = self.files.get(relpath) if relpath else None
+    return entry[1] if entry else None
+
+  def iter_files(self, from_, to):
+    """
+    Like :func:`copyengine.iter_files` but generates the files from the
+    manifest instead of walking the file system. Returns None if *from_*
+    is not covered by the manifest.
+    """
+
+    relpath = self.relpath(from_)
+    if relpath is None:
+      return None
+    if relpath in self.files:
+      return iter([(from_, to, self.files[relpath][0])])
+    if relpath == '.':
+      prefix = ''
+    else:
+      prefix = relpath.rstrip('/') + '/'
+    keys = (key for key in self.files if key.startswith(prefix))
+    first = next(keys, None)
+    if first is None:
+      return None
+    return self._iter_keys(from_, to, prefix, itertools.chain([first], keys))
+
+  def _iter_keys(self, from_, to, prefix, keys):
+    # The files are generated lazily, so that the pipeline mode does not
+    # need a list of all files.
+    for key in keys:
+      rest = key[len(prefix):].split('/')
+      yield (os.path.join(from_, *rest), os.path.join(to, *rest), self.files[key][0])
@@ -0,0 +1,106 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+The payload is a compressed archive of the ``data/install`` directory that
+can be bundled with the installer instead of the loose files (see
+``.scripts/make-payload.py``). Its files are extracted directly to their
+target location, so PyInstaller does not have to unpack them first.
+"""
+
+from .manifest import Manifest
+
+import collections
+import threading
+import time
+import zipfile
+
+
+class Payload(object):
+  """
+  Provides access to the files in the zip archive *filename* as if the
+  archive was extracted to the *root* directory. The paths passed to the
+  methods of this class are the paths that the files would have in the
+  *root* directory.
+
+  Every thread that reads from the payload uses its own handle to the
+  archive, so files can be extracted concurrently. The handles are closed
+  with :meth:`close`.
+  """
+
+  def __init__(self, filename, root):
+    self.filename = filename
+    self._local = threading.local()
+    self._lock = threading.Lock()
+    self._handles = []
+    self._members = collections.OrderedDict()
+    with zipfile.ZipFile(filename) as zf:
+      for info in zf.infolist():
+        if not info.filename.endswith('/'):
+          self._members[info.filename] = info
+    files = collections.OrderedDict(
+        (k, (info.file_size, None)) for k, info in self._members.items())
+    self.manifest = Manifest(root, None, files)
+    self.root = self.manifest.root
+
+  def __len__(self):
+    return len(self._members)
+
+  def member(self, path):
+    """
+    Returns the :class:`zipfile.ZipInfo` for the file *path* or None if
+    it is not in the payload.
+    """
+
+    relpath = self.manifest.relpath(path)
+    return self._members.get(relpath) if relpath else None
+
+  def iter_files(self, from_, to):
+    """
+    Like :meth:`Manifest.iter_files` for the files in the payload.
+    """
+
+    return self.manifest.iter_files(from_, to)
+
+  def open(self, member):
+    """
+    Opens the :class:`zipfile.ZipInfo` *member* for reading.
+    """
+
+    zf = getattr(self._local, 'zipfile', None)
+    if zf is None:
+      zf = self._local.zipfile = zipfile.ZipFile(self.filename)
+      with self._lock:
+        self._handles.append(zf)
+    return zf.open(member)
+
+  def close(self):
+    """
+    Closes the handles to the archive of all threads. The payload can
+    still be used afterwards, the handles are opened again.
+    """
+
+    with self._lock:
+      handles, self._handles = self._handles, []
+      self._local = threading.local()
+    for zf in handles:
+      zf.close()
+
+  def mtime(self, member):
+    """
+    Returns the modification time of *member* as a timestamp.
+    """
+
+    return time.mktime(member.date_time + (0, 0, -1))
@@ -0,0 +1,153 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+A journal of the files that have been copied completely, so that an
+installation that was interrupted can be resumed.
+
+The file starts with a header line that contains the format version and a
+JSON object with the files to copy of the installation. Every following
+line is one entry with tab-separated fields:
+
+    <type> <size> <mtime> <hash> <path>
+
+*type* is ``f`` for files and ``d`` for directories that were created by
+the installation. Backslashes, tabs and line breaks in the *path* are
+escaped like in the uninstall data file. The lines are written as soon as a file is complete, an
+incomplete last line is ignored when the journal is read.
+"""
+
+from .copyengine import file_hash
+from .uninstalldata import escape_path, unescape_path
+
+import json
+import os
+
+MAGIC = 'C4DINSTALLER-RESUME'
+VERSION = 1
+
+
+class ResumeJournal(object):
+  """
+  Records the files and directories of an installation of *copyfiles* in
+  the journal *filename*. After :meth:`load`, :attr:`files` maps the
+  target paths of the files that were recorded in a previous run to their
+  size, modification time and hash, and :attr:`dirs` lists the created
+  directories in creation order.
+
+  The journal is not thread-safe, calls to :meth:`addFile` and
+  :meth:`addDir` must be serialized by the caller.
+  """
+
+  def __init__(self, filename, copyfiles):
+    self.filename = filename
+    self.copyfiles = [list(x) for x in copyfiles]
+    self.files = {}
+    self.dirs = []
+    self._fp = None
+
+  def load(self):
+    """
+    Reads the journal of a previous run. Returns True if it exists and
+    was written for the same *copyfiles*, otherwise :attr:`files` and
+    :attr:`dirs` stay empty.
+    """
+
+    try:
+      fp = open(self.filename, encoding='utf8')
+    except FileNotFoundError:
+      return False
+    with fp:
+      line = fp.readline()
+      if not line.startswith(MAGIC + ' '):
+        return False
+      _, version, header = line.split(' ', 2)
+      if int(version) != VERSION or json.loads(header)['copyfiles'] != self.copyfiles:
+        return False
+      for line in fp:
+        if not line.endswith('\n'):
+          break
+        try:
+          kind, size, mtime, hash, path = line.rstrip('\n').split('\t', 4)
+          path = unescape_path(path)
+          if kind == 'd':
+            self.dirs.append(path)
+          else:
+            self.files[path] = (int(size), float(mtime), hash or None)
+        except ValueError:
+          break
+    return True
+
+  def begin(self, resume=False):
+    """
+    Opens the journal for writing. Unless *resume* is True, the previous
+    journal is replaced.
+    """
+
+    if resume:
+      self._fp = open(self.filename, 'a', encoding='utf8')
+    else:
+      self._fp = open(self.filename, 'w', encoding='utf8')
+      print(MAGIC, VERSION, json.dumps({'copyfiles': self.copyfiles}), file=self._fp)
+      self._fp.flush()
+
+  def _write(self, *fields):
+    print(*fields, sep='\t', file=self._fp)
+    self._fp.flush()
+
+  def addFile(self, path, size, mtime, hash=None):
+    self._write('f', size, repr(float(mtime)), hash or '', escape_path(path))
+
+  def addDir(self, path):
+    self._write('d', '', '', '', escape_path(path))
+
+  def isComplete(self, path, filename=None, size=None, hash=None, algorithm=None):
+    """
+    Returns True if the target *path* is recorded in the journal and the
+    file, which is at *filename* if it was staged, still has the recorded
+    size and modification time. *size* is the size of the source file.
+    If *algorithm* is specified, the file is hashed and compared to *hash*,
+    or to the recorded hash if *hash* is None.
+    """
+
+    entry = self.files.get(path)
+    if entry is None or (size is not None and size != entry[0]):
+      return False
+    try:
+      st = os.stat(filename or path)
+    except FileNotFoundError:
+      return False
+    if st.st_size != entry[0] or abs(st.st_mtime - entry[1]) >= 2.0:
+      return False
+    if algorithm:
+      expected = hash or entry[2]
+      return bool(expected) and file_hash(filename or path, algorithm) == expected
+    return True
+
+  def close(self):
+    if self._fp:
+      self._fp.close()
+      self._fp = None
+
+  def remove(self):
+    """
+    Closes and deletes the journal.
+    """
+
+    self.close()
+    try:
+      os.remove(self.filename)
+    except FileNotFoundError:
+      pass
@@ -0,0 +1,135 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Transactional installation through a staging directory. The files are
+first copied into the staging directory, which is on the same file system
+as the target, and then moved to their target location with renames.
+"""
+
+from .copyengine import scandir
+
+import json
+import os
+import shutil
+
+
+class Staging(object):
+  """
+  Stages files that are to be installed into the *root* directory in the
+  staging *directory*. A journal in the staging directory records whether
+  the files are still being staged or are being committed, so that an
+  interrupted installation can be rolled back or completed with
+  :meth:`recover`.
+  """
+
+  Staging = 'staging'
+  Commit = 'commit'
+
+  def __init__(self, directory, root):
+    self.directory = os.path.abspath(directory)
+    self.root = os.path.abspath(root)
+    self.files = os.path.join(self.directory, 'files')
+    self.journal = os.path.join(self.directory, 'journal.json')
+
+  def path(self, path):
+    """
+    Returns the path in the staging directory for the target *path* or
+    None if *path* is not inside the root directory.
+    """
+
+    try:
+      relpath = os.path.relpath(os.path.abspath(path), self.root)
+    except ValueError:
+      return None
+    if relpath == os.curdir or relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+      return None
+    return os.path.join(self.files, relpath)
+
+  def state(self):
+    """
+    Returns the state that is recorded in the journal or None if there is
+    no journal.
+    """
+
+    try:
+      with open(self.journal) as fp:
+        return json.load(fp)['state']
+    except FileNotFoundError:
+      return None
+
+  def _writeJournal(self, state):
+    filename = self.journal + '.tmp'
+    with open(filename, 'w') as fp:
+      json.dump({'state': state, 'root': self.root}, fp)
+      fp.flush()
+      os.fsync(fp.fileno())
+    os.replace(filename, self.journal)
+
+  def begin(self):
+    """
+    Creates the staging directory and the journal. Files that were kept
+    by :meth:`recover` stay in the staging directory.
+    """
+
+    os.makedirs(self.files, exist_ok=True)
+    self._writeJournal(self.Staging)
+
+  def commit(self):
+    """
+    Moves the staged files to their target location. Directories that do
+    not exist in the target location are moved as a whole. The staging
+    directory is removed afterwards.
+    """
+
+    self._writeJournal(self.Commit)
+    self._merge(self.files, self.root)
+    self.rollback()
+
+  def rollback(self):
+    """
+    Removes the staging directory including the journal.
+    """
+
+    if os.path.isdir(self.directory):
+      shutil.rmtree(self.directory)
+
+  def recover(self, keep=False):
+    """
+    Checks the journal for an interrupted installation. If it was
+    interrupted while the files were staged, the staging directory is
+    removed unless *keep* is True. If it was interrupted during the
+    commit, the commit is completed. Returns the state from the journal
+    or None.
+    """
+
+    state = self.state()
+    if state == self.Commit:
+      self.commit()
+    elif keep and state == self.Staging:
+      pass
+    elif os.path.isdir(self.directory):
+      self.rollback()
+    return state
+
+  def _merge(self, src, dst):
+    for entry in scandir(src):
+      target = os.path.join(dst, entry.name)
+      if entry.is_dir(follow_symlinks=False) and os.path.isdir(target):
+        self._merge(entry.path, target)
+      elif entry.is_dir(follow_symlinks=False):
+        os.rename(entry.path, target)
+      else:
+        os.replace(entry.path, target)
@@ -0,0 +1,190 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Reading and writing the uninstall data file that lists everything the
+installer created.
+
+The file starts with a header line that contains the format version and a
+JSON object with the root directory, the hash algorithm and the number of
+entries. Every following line is one entry with tab-separated fields:
+
+    <prefix> <type> <size> <mtime> <hash> <suffix>
+
+The path of the entry relative to the root directory is the first *prefix*
+characters of the previous path plus *suffix*. If the paths do not share a
+root directory, eg. on Windows when they are on different drives, the root
+is empty and the paths are absolute. Backslashes, tabs and line breaks in
+the *suffix* are escaped with a backslash. *type* is ``f`` for files and
+``d`` for directories. The *size*, *mtime* and *hash* fields may be empty
+if they are unknown.
+
+Files written by older versions of the installer contain just one absolute
+path per line, these can still be read.
+"""
+
+from .copyengine import file_hash
+
+import collections
+import json
+import os
+import re
+
+MAGIC = 'C4DINSTALLER-UNINSTALL'
+VERSION = 2
+
+Entry = collections.namedtuple('Entry', 'path isdir size mtime hash')
+Entry.__new__.__defaults__ = (None, None, None, None)
+
+_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+_UNESCAPES = {v[1]: k for k, v in _ESCAPES.items()}
+
+
+def escape_path(path):
+  """
+  Escapes backslashes, tabs and line breaks in *path* with a backslash,
+  so that it can be stored in a field of a tab-separated line.
+  """
+
+  return ''.join(_ESCAPES.get(c, c) for c in path)
+
+
+def unescape_path(path):
+  """
+  Reverses :func:`escape_path`.
+  """
+
+  return re.sub(r'\\(.)', lambda m: _UNESCAPES[m.group(1)], path)
+
+
+def _common_root(paths):
+  # Returns an empty string if the paths have no common root directory.
+  prefix = os.path.commonprefix([os.path.dirname(x) + os.sep for x in paths])
+  return prefix[:prefix.rfind(os.sep) + 1]
+
+
+def write_uninstall_data(filename, entries, algorithm=None):
+  """
+  Writes the :class:`Entry` objects in *entries* to *filename*. *algorithm*
+  is the name of the hash algorithm that was used for the hashes of the
+  entries.
+  """
+
+  entries = [x._replace(path=os.path.normpath(x.path)) for x in entries]
+  root = _common_root([x.path for x in entries]) if entries else os.sep
+  header = collections.OrderedDict()
+  header['root'] = root
+  header['algorithm'] = algorithm
+  header['count'] = len(entries)
+
+  def field(value):
+    return '' if value is None else str(value)
+
+  with open(filename, 'w', encoding='utf8') as fp:
+    print(MAGIC, VERSION, json.dumps(header), file=fp)
+    last = ''
+    for entry in entries:
+      relpath = entry.path[len(root):].replace(os.sep, '/')
+      prefix = len(os.path.commonprefix([last, relpath]))
+      mtime = None if entry.mtime is None else int(entry.mtime)
+      print(prefix, 'd' if entry.isdir else 'f', field(entry.size), field(mtime),
+          field(entry.hash), escape_path(relpath[prefix:]), sep='\t', file=fp)
+      last = relpath
+
+
+class UninstallDataReader(object):
+  """
+  Reads the entries of an uninstall data file one by one. Old files that
+  list one path per line are read as entries where only the path is known.
+
+  .. attribute:: count
+
+    The number of entries in the file.
+
+  .. attribute:: algorithm
+
+    The name of the hash algorithm of the entry hashes or None.
+  """
+
+  def __init__(self, filename):
+    self.filename = filename
+    self.algorithm = None
+    self.root = None
+    self.legacy = False
+    self._fp = open(filename, encoding='utf8')
+    line = self._fp.readline()
+    if line.startswith(MAGIC + ' '):
+      _, version, header = line.split(' ', 2)
+      if int(version) != VERSION:
+        raise ValueError('unsupported uninstall data version: {}'.format(version))
+      header = json.loads(header)
+      self.root = header['root']
+      self.algorithm = header['algorithm']
+      self.count = header['count']
+    else:
+      self._fp.close()
+      self.legacy = True
+      with open(filename) as fp:
+        self.count = sum(1 for x in fp if x.strip())
+      self._fp = open(filename)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def __iter__(self):
+    if self.legacy:
+      for line in self._fp:
+        if line.strip():
+          yield Entry(line.rstrip('\n'))
+      return
+    last = ''
+    for line in self._fp:
+      prefix, kind, size, mtime, hash, suffix = line.rstrip('\n').split('\t', 5)
+      relpath = last[:int(prefix)] + unescape_path(suffix)
+      last = relpath
+      path = os.path.join(self.root, relpath.replace('/', os.sep))
+      yield Entry(path, kind == 'd',
+          int(size) if size else None, int(mtime) if mtime else None, hash or None)
+
+  def close(self):
+    self._fp.close()
+
+
+def is_modified(entry, algorithm=None):
+  """
+  Returns True if the file of *entry* was modified since it was installed.
+  If the size matches but the modification time does not, the file is
+  hashed if the entry has a hash. Returns False for directories, files
+  that do not exist and entries without information to compare with.
+  """
+
+  if entry.isdir or entry.size is None:
+    return False
+  try:
+    st = os.stat(entry.path)
+  except FileNotFoundError:
+    return False
+  if st.st_size != entry.size:
+    return True
+  # The modification time is stored with a 1 second resolution, and FAT
+  # file systems have a 2 second resolution.
+  if entry.mtime is not None and abs(st.st_mtime - entry.mtime) < 2.0:
+    return False
+  if entry.hash and algorithm:
+    return file_hash(entry.path, algorithm) != entry.hash
+  return entry.mtime is not None
@@ -28,7 +28,7 @@ class WelcomePage(FormPage('upage00welcome')):
 
   def initForm(self):
     self.initButtonBox('uninstallPage')
-    self.label.setText(self.ls('uninstall.welcome'))
+    self.setLocalizedText(self.label.setText, 'uninstall.welcome')
 
 
 class UninstallPage(FormPage('upage01uninstall')):
@@ -36,7 +36,7 @@ class UninstallPage(FormPage('upage01uninstall')):
   def initForm(self):
     self.initButtonBox()
     dataFile = self.installer.dataFile
-    self.uninstallThread = UninstallThread(dataFile)
+    self.uninstallThread = UninstallThread(dataFile, self.config('install.workers', 1))
     self.uninstallThread.progressUpdate.connect(self.on_progressUpdate, Qt.QueuedConnection)
     self.becomesVisible.connect(self.on_becomesVisible)
     self.buttonClose.setEnabled(False)
@@ -45,7 +45,7 @@ class UninstallPage(FormPage('upage01uninstall')):
     if not dataFile:
       self.label.setText('devnote: Not in a frozen environment, no uninstall file found')
     else:
-      self.label.setText(self.ls('uninstall.processing'))
+      self.setLocalizedText(self.label.setText, 'uninstall.processing')
 
   def on_becomesVisible(self):
     self.uninstallThread.start()
@@ -68,12 +68,9 @@ class Uninstaller(BaseInstaller):
         # for testing purposes we still want the uninstaller to run.
         self.dataFile = None
 
-      self.welcomePage = WelcomePage(self)
-      self.uninstallPage = UninstallPage(self)
+      self.addPage('welcomePage', WelcomePage)
+      self.addPage('uninstallPage', UninstallPage)
 
-      self.stackedPages.addWidget(self.welcomePage)
-      self.stackedPages.addWidget(self.uninstallPage)
-
-      self.setWindowTitle(self.ls('uninstall.title'))
+      self.setLocalizedText(self.setWindowTitle, 'uninstall.title')
       self.setCurrentPage(self.welcomePage)
       super().initForm()
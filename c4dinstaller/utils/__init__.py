@@ -14,12 +14,49 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from PyQt5.QtWidgets import QApplication, QMessageBox
+from .. import STARTED
 
 import sys
+import time
+
+
+class StartupTimer(object):
+  """
+  Measures the phases until the installer window is shown. Every call to
+  :meth:`mark` ends the phase with the specified *name*, the first phase
+  starts at *started* (a :func:`time.monotonic` timestamp), which defaults
+  to now.
+  """
+
+  def __init__(self, started=None):
+    self.started = time.monotonic() if started is None else started
+    self.phases = []
+    self.reported = False
+    self._last = self.started
+
+  def mark(self, name):
+    now = time.monotonic()
+    self.phases.append((name, now - self._last))
+    self._last = now
+
+  def report(self):
+    for name, duration in self.phases:
+      print('info: startup: {:<16} {:7.3f}s'.format(name, duration))
+    print('info: startup: {:<16} {:7.3f}s'.format('total', self._last - self.started))
+    self.reported = True
+
+
+# Starts when the c4dinstaller package is imported, so that the time to
+# import the package and its dependencies is included.
+startup = StartupTimer(STARTED)
 
 
 def fatal(message):
+  try:
+    # Imported here so that the headless installer does not load Qt.
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+  except ImportError:
+    QApplication = QMessageBox = None
   if QMessageBox:
     try:
       app = QApplication(sys.argv)
@@ -14,19 +14,151 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
-Find Cinema 4D installations on Windows and Mac OS.
+Find Cinema 4D installations on Windows and Mac OS, and in additional
+search roots on any platform.
 """
 
+import collections
+import concurrent.futures
+import json
 import os
 import pipes
 import shlex
 import subprocess
 import re
+import sys
+import threading
+
+try:
+  from os import scandir
+except ImportError:
+  # Python < 3.5
+  from scandir import scandir
 
 if os.name == 'nt':
   from . import winreg
 
 C4D_PATTERN = r'cinema\s*4d\s*r(\d{2})([^\\/]*)'
+SEARCH_ROOTS = ['/Applications', '/Applications/MAXON', '~/Applications', '~/Applications/MAXON']
+CACHE_VERSION = 1
+
+# A directory that matches the C4D_PATTERN is an installation if it
+# contains any of these files.
+INSTALLATION_MARKERS = ['CINEMA 4D.app', 'CINEMA 4D.exe', 'Commandline.app',
+                        'Commandline.exe', 'Commandline']
+
+# Directories with these suffixes are never searched for installations.
+PRUNE_SUFFIXES = ('.app', '.bundle', '.framework', '.plugin', '.pkg')
+
+_C4D_REGEX = re.compile(C4D_PATTERN, re.I)
+
+Installation = collections.namedtuple('Installation', 'name path version suffix root')
+Installation.__doc__ = """
+A Cinema 4D installation in the directory *path*. *version* is the
+major release number (eg. 18) and *suffix* the rest of the directory name
+after it (eg. ``'.024'``), or None and an empty string if the name does
+not include the version. *root* is the search root the installation was
+found in, or None if it was found in another way.
+"""
+
+
+def make_installation(name, path, root=None):
+  """
+  Creates an :class:`Installation` for the directory *path*, reading the
+  version from its *name*.
+  """
+
+  match = _C4D_REGEX.search(name)
+  if not match:
+    return Installation(name, path, None, '', root)
+  return Installation(name, path, int(match.group(1)), match.group(2).strip(), root)
+
+
+def default_cache_file():
+  if os.name == 'nt':
+    base = os.getenv('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    return os.path.join(base, 'C4DInstaller', 'installations.json')
+  elif sys.platform == 'darwin':
+    return os.path.expanduser('~/Library/Caches/C4DInstaller/installations.json')
+  base = os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+  return os.path.join(base, 'c4dinstaller', 'installations.json')
+
+
+class FinderCache(object):
+  """
+  Remembers the installations that were found in every search root in
+  the JSON file *filename*. The installations of a root are valid as long
+  as the modification time of every directory that was listed and of every
+  directory that matches :data:`C4D_PATTERN` did not change, which is the
+  case unless an entry was added to or removed from them.
+  """
+
+  def __init__(self, filename):
+    self.filename = filename
+    self.roots = {}
+    self._lock = threading.Lock()
+    self._modified = False
+    try:
+      with open(filename) as fp:
+        data = json.load(fp)
+      if data.get('version') == CACHE_VERSION:
+        self.roots = data['roots']
+    except (OSError, ValueError, KeyError):
+      pass
+
+  def get(self, root, depth):
+    """
+    Returns the list of :class:`Installation` objects found in *root*
+    with the same search *depth* if the cache entry is still valid,
+    otherwise None.
+    """
+
+    with self._lock:
+      entry = self.roots.get(root)
+    if not entry or entry['depth'] != depth:
+      return None
+    paths = entry['dirs'] + [x[1:3] for x in entry['candidates']]
+    for path, mtime in paths:
+      try:
+        if os.stat(path).st_mtime != mtime:
+          return None
+      except OSError:
+        return None
+    return [make_installation(name, path, root)
+            for name, path, _, valid in entry['candidates'] if valid]
+
+  def put(self, root, depth, dirs, candidates):
+    """
+    Stores the ``(path, mtime)`` of the *dirs* that were listed and the
+    ``(name, path, mtime, valid)`` *candidates* found in *root* up to
+    *depth* levels deep. *valid* is True if the candidate is an
+    installation.
+    """
+
+    with self._lock:
+      self.roots[root] = {'depth': depth, 'dirs': [list(x) for x in dirs],
+          'candidates': [list(x) for x in candidates]}
+      self._modified = True
+
+  def save(self):
+    """
+    Writes the cache if it was modified. Errors are ignored, the cache
+    is only an optimization.
+    """
+
+    with self._lock:
+      if not self._modified:
+        return
+      data = {'version': CACHE_VERSION, 'roots': self.roots}
+      try:
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename + '.tmp', 'w') as fp:
+          json.dump(data, fp)
+        os.replace(self.filename + '.tmp', self.filename)
+      except OSError as exc:
+        print('Warning: Could not save the installation cache:', exc)
+        return
+      self._modified = False
 
 
 def __find_installations_windows():
@@ -51,39 +183,153 @@ def __find_installations_windows():
 
   versions = []
   for path in paths:
-    match = re.search(C4D_PATTERN, path, re.I)
+    match = _C4D_REGEX.search(path)
     if match:
       name = 'Cinema 4D R' + match.group(1) + match.group(2)
-      versions.append((name, path))
+      versions.append(make_installation(name, path))
     else:
-      versions.append(('Cinema 4D ({})'.format(path), path))
+      versions.append(make_installation('Cinema 4D ({})'.format(path), path))
 
   return versions
 
 
-def __find_installations_mac():
-  # Currently our only method is looking for common installation paths.
+def _is_installation(path):
+  return any(os.path.exists(os.path.join(path, x)) for x in INSTALLATION_MARKERS)
+
+
+def _may_contain_installations(entry):
+  # Bundles and hidden directories are not searched. Symbolic links are
+  # not followed into, they could lead into a cycle.
+  name = entry.name.lower()
+  if name.startswith('.') or name.endswith(PRUNE_SUFFIXES):
+    return False
+  return entry.is_dir(follow_symlinks=False)
+
+
+def scan_root(root, depth=1, cache=None):
+  """
+  Returns a list of :class:`Installation` objects in the directory *root*
+  and its subdirectories up to *depth* levels deep, from the *cache* if it
+  is still valid. Directories that match :data:`C4D_PATTERN` are not
+  searched any further, neither are bundles and hidden directories.
+  """
+
+  result = cache.get(root, depth) if cache else None
+  if result is not None:
+    return result
+
+  dirs = []
+  candidates = []
+  stack = [(root, 1)]
+  while stack:
+    path, level = stack.pop()
+    try:
+      mtime = os.stat(path).st_mtime
+      entries = list(scandir(path))
+    except OSError:
+      if path == root:
+        return []
+      continue
+    dirs.append((path, mtime))
+    for entry in entries:
+      if _C4D_REGEX.match(entry.name):
+        if entry.is_dir():
+          candidates.append((entry.name, entry.path, entry.stat().st_mtime,
+              _is_installation(entry.path)))
+      elif level < depth and _may_contain_installations(entry):
+        stack.append((entry.path, level + 1))
+
+  candidates.sort(key=lambda x: x[1])
+  if cache:
+    cache.put(root, depth, dirs, candidates)
+  return [make_installation(name, path, root)
+          for name, path, _, valid in candidates if valid]
+
+
+def search_roots(roots=()):
+  """
+  Returns the list of directories to search, the default
+  :data:`SEARCH_ROOTS` on Mac OS followed by the additional *roots*.
+  ``~`` and environment variables are expanded.
+  """
+
   result = []
-  paths = ['/Applications', '/Applications/MAXON', '~/Applications', '~/Applications/MAXON']
-  for path in paths:
-    path = os.path.expanduser(path)
-    if not os.path.isdir(path): continue
-    for item in os.listdir(path):
-      match = re.match(C4D_PATTERN, item, re.I)
-      if match and os.path.exists(os.path.join(path, item, 'CINEMA 4D.app')):
-        result.append((item, os.path.join(path, item)))
+  for path in (SEARCH_ROOTS if os.name != 'nt' else []) + list(roots):
+    path = os.path.abspath(os.path.expandvars(os.path.expanduser(path)))
+    if path not in result:
+      result.append(path)
+  return result
 
+
+def _scan_roots(roots, depth, callback=None, cache=None):
+  # The roots are listed concurrently, they may be on network volumes.
+  results = {}
+  if not roots:
+    return []
+  with concurrent.futures.ThreadPoolExecutor(len(roots)) as executor:
+    futures = {executor.submit(scan_root, root, depth, cache): root for root in roots}
+    for future in concurrent.futures.as_completed(futures):
+      try:
+        results[futures[future]] = future.result()
+      except OSError as exc:
+        print('Warning: Could not search {}: {}'.format(futures[future], exc))
+        continue
+      if callback:
+        for installation in results[futures[future]]:
+          callback(installation)
+  if cache:
+    cache.save()
+
+  result = []
+  for root in roots:
+    result += results.get(root, [])
   return result
 
 
-def find_installations():
+def find_installations(callback=None, cache=True, roots=(), depth=1):
+  """
+  Returns a list of :class:`Installation` objects for the Cinema 4D
+  installations on this machine. If *callback* is specified, it is invoked
+  with every installation as soon as it has been found.
+
+  On Windows, the installations are looked up in the registry. The
+  :func:`search_roots` with the additional *roots* are searched up to
+  *depth* levels deep with :func:`scan_root`, concurrently, and the result
+  of every root is stored in a :class:`FinderCache`. *cache* is the name of
+  the cache file, True for the :func:`default_cache_file` or None to not
+  use a cache.
+  """
+
+  result = []
   if os.name == 'nt':
-    return __find_installations_windows()
-  else:
-    return __find_installations_mac()
+    result = __find_installations_windows()
+    if callback:
+      for installation in result:
+        callback(installation)
+
+  # Installations that were found in the registry or another root are
+  # skipped, the roots may overlap with a deeper search.
+  reported = set(os.path.normcase(x.path) for x in result)
+  def found(installation):
+    key = os.path.normcase(installation.path)
+    if key not in reported:
+      reported.add(key)
+      callback(installation)
+
+  if cache is True:
+    cache = default_cache_file()
+  scanned = _scan_roots(search_roots(roots), depth, found if callback else None,
+      FinderCache(cache) if cache else None)
+  known = set(os.path.normcase(x.path) for x in result)
+  for installation in scanned:
+    key = os.path.normcase(installation.path)
+    if key not in known:
+      known.add(key)
+      result.append(installation)
+  return result
 
 
 if __name__ == '__main__':
   print("Searching for Cinema 4D installations ...")
-  for name, path in find_installations():
-    print('{}: {}'.format(name, path))
+  for installation in find_installations(roots=sys.argv[1:]):
+    print('{}: {}'.format(installation.name, installation.path))
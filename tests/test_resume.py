@@ -0,0 +1,55 @@
+# C4D Installer
+# Copyright (C) 2016  Niklas Rosenstein
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from c4dinstaller.resume import ResumeJournal
+
+
+class ResumeJournalTest(unittest.TestCase):
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.filename = os.path.join(self.root, 'uninstall.data.journal')
+    self.copyfiles = [('/src', self.root)]
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def test_special_characters_in_paths(self):
+    paths = [os.path.join(self.root, name) for name in
+             ('tab\tname', 'line\nbreak', 'carriage\rreturn', 'back\\slash\\t', 'plain')]
+    journal = ResumeJournal(self.filename, self.copyfiles)
+    journal.begin()
+    journal.addDir(paths[0])
+    for i, path in enumerate(paths[1:]):
+      journal.addFile(path, i, 1000.0 + i, 'hash{}'.format(i))
+    journal.close()
+
+    journal = ResumeJournal(self.filename, self.copyfiles)
+    self.assertTrue(journal.load())
+    self.assertEqual(journal.dirs, paths[:1])
+    self.assertEqual(journal.files, {path: (i, 1000.0 + i, 'hash{}'.format(i))
+                                     for i, path in enumerate(paths[1:])})
+
+
+if __name__ == '__main__':
+  unittest.main()